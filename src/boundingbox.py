@@ -18,12 +18,64 @@ class BoundingBox:
             size_in_tiles: Width and length of the entity in tiles (e.g., 2.0 for raft, 1.0 for crate)
         """
         self.world_pos: Vector3 = world_pos
-        self.height_in_tiles: float = height_in_tiles
+        self._height_in_tiles: float = height_in_tiles
 
-        self.size_in_tiles: float = size_in_tiles
+        self._size_in_tiles: float = size_in_tiles
+        
+        # World AABB with margin applied, cached for the tile size it was computed for
+        # and refreshed when the position or the size changes
+        self._tile_h: int = 0
+        self._aabb: Tuple[float, float, float, float, float, float] = (0.0, 0.0, 0.0, 0.0, 0.0, 0.0)
+        self._rect: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0)
+    
+    @property
+    def height_in_tiles(self) -> float:
+        return self._height_in_tiles
+    
+    @height_in_tiles.setter
+    def height_in_tiles(self, height_in_tiles: float) -> None:
+        self._height_in_tiles = height_in_tiles
+        self._refresh()
+    
+    @property
+    def size_in_tiles(self) -> float:
+        return self._size_in_tiles
+    
+    @size_in_tiles.setter
+    def size_in_tiles(self, size_in_tiles: float) -> None:
+        self._size_in_tiles = size_in_tiles
+        self._refresh()
+    
+    def _refresh(self) -> None:
+        """Recompute the cached AABB (if already computed for a tile size)"""
+        tile_h: int = self._tile_h
+        if not tile_h:
+            return
+        x = self.world_pos.x + MARGIN
+        y = self.world_pos.y + MARGIN
+        z = self.world_pos.z
+        # Use size_in_tiles to determine the actual bounding box dimensions
+        width = (tile_h * self._size_in_tiles) - (MARGIN * 2)
+        height = (tile_h * self._size_in_tiles) - (MARGIN * 2)
+        self._aabb = (x, y, z, x + width, y + height, z + self._height_in_tiles * tile_h)
+        self._rect = (x, y, width, height)
+    
+    def get_aabb(self, tile_h: int) -> Tuple[float, float, float, float, float, float]:
+        """Get the world AABB with margin applied (cached, no allocation)
+        
+        Args:
+            tile_h: Tile height in pixels
+            
+        Returns:
+            Tuple of (min_x, min_y, min_z, max_x, max_y, max_z) in world coordinates
+        """
+        if tile_h != self._tile_h:
+            self._tile_h = tile_h
+            self._refresh()
+        return self._aabb
     
     def get_bounding_box(self, tile_h: int) -> Tuple[float, float, float, float]:
-        """Get bounding box in world coordinates with margin applied
+        """Get bounding box in world coordinates with margin applied (cached)
         
         Args:
             tile_h: Tile height in pixels
@@ -31,13 +83,10 @@ class BoundingBox:
         Returns:
             Tuple of (x, y, width, height) in world coordinates
         """
-        x = self.world_pos.x + MARGIN
-        y = self.world_pos.y + MARGIN
-        # Use size_in_tiles to determine the actual bounding box dimensions
-        width = (tile_h * self.size_in_tiles) - (MARGIN * 2)
-        height = (tile_h * self.size_in_tiles) - (MARGIN * 2)
-        
-        return (x, y, width, height)
+        if tile_h != self._tile_h:
+            self._tile_h = tile_h
+            self._refresh()
+        return self._rect
     
     def get_corners_world(self, tile_h: int) -> Tuple[Tuple[float, float], ...]:
         """Get the four corners of the bounding box in world coordinates
@@ -101,7 +150,10 @@ class BoundingBox:
     def update_position(self, world_pos: Vector3) -> None:
         """Update the bounding box position
         
+        Must also be called after changing world_pos in place.
+        
         Args:
             world_pos: New position in world coordinates
         """
-        self.world_pos = world_pos
\ No newline at end of file
+        self.world_pos = world_pos
+        self._refresh()
\ No newline at end of file
@@ -0,0 +1,188 @@
+from typing import Dict, List, Set, Tuple
+
+from entity import Entity
+from collision import check_entity_collision_3d
+
+
+class Endpoint:
+    """Start or end of an entity's interval on one axis"""
+
+    __slots__ = ("value", "is_min", "owner", "index")
+
+    def __init__(self, value: float, is_min: bool, owner: int) -> None:
+        self.value: float = value
+        self.is_min: bool = is_min
+        self.owner: int = owner
+        self.index: int = 0
+
+    def key(self) -> Tuple[float, bool]:
+        # At equal values ends sort before starts: touching boxes do not overlap,
+        # as in check_entity_collision_3d
+        return (self.value, self.is_min)
+
+
+class SweepAndPrune:
+    """Incremental sweep-and-prune broadphase for entity-vs-entity contacts
+
+    Keeps the endpoints of every entity AABB (margins applied) sorted on the X
+    and Y axes. Moved entities are re-sorted by insertion sort, and each swap
+    of a start with an end updates the number of axes on which the two
+    entities overlap. Pairs overlapping on both axes are the candidates handed
+    to the narrowphase (check_entity_collision_3d, which adds the Z axis).
+    Motion between frames is small, so an update costs about O(n + swaps).
+    """
+
+    AXES: Tuple[int, int] = (0, 1)
+
+    def __init__(self, entities: List[Entity], tile_h: int) -> None:
+        """Build the sorted endpoint lists
+
+        Args:
+            entities: Entities with an initialized bounding box, in room order
+            tile_h: Tile height in pixels
+        """
+        self.entities: List[Entity] = list(entities)
+        self.tile_h: int = tile_h
+        self.ids: Dict[Entity, int] = {entity: i for i, entity in enumerate(self.entities)}
+
+        # Per axis: sorted endpoints, and the (min, max) endpoints of each entity
+        self.endpoints: List[List[Endpoint]] = []
+        self.entity_endpoints: List[List[Tuple[Endpoint, Endpoint]]] = []
+        # Number of axes on which each pair (i < j) overlaps, and pairs overlapping on all
+        self.overlap_counts: Dict[Tuple[int, int], int] = {}
+        self.candidates: Set[Tuple[int, int]] = set()
+        self.moved: Set[int] = set()
+
+        # Statistics of the last update, and since the room was loaded
+        self.swaps: int = 0
+        self.pairs_tested: int = 0
+        self.pairs_found: int = 0
+        self.total_tested: int = 0
+        self.total_found: int = 0
+
+        for axis in self.AXES:
+            pairs: List[Tuple[Endpoint, Endpoint]] = []
+            for i, entity in enumerate(self.entities):
+                aabb = entity.bbox.get_aabb(tile_h)
+                pairs.append((Endpoint(aabb[axis], True, i), Endpoint(aabb[axis + 3], False, i)))
+            endpoints: List[Endpoint] = sorted((e for pair in pairs for e in pair), key=Endpoint.key)
+            for index, endpoint in enumerate(endpoints):
+                endpoint.index = index
+            self.endpoints.append(endpoints)
+            self.entity_endpoints.append(pairs)
+
+            # Initial overlaps: sweep the axis keeping the open intervals
+            active: Set[int] = set()
+            for endpoint in endpoints:
+                if endpoint.is_min:
+                    for other in active:
+                        self._add_overlap(endpoint.owner, other)
+                    active.add(endpoint.owner)
+                else:
+                    active.discard(endpoint.owner)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def mark_moved(self, entity: Entity) -> None:
+        """Move listener: re-sort the entity's endpoints on the next update
+
+        Args:
+            entity: Entity that moved
+        """
+        i = self.ids.get(entity)
+        if i is not None:
+            self.moved.add(i)
+
+    def update(self) -> List[Tuple[Entity, Entity]]:
+        """Re-sort the moved entities, then run the narrowphase on the candidate pairs
+
+        Only pairs of solid, visible entities are reported, as for the hero
+        collision queries.
+
+        Returns:
+            Colliding (entity, entity) pairs, in room order
+        """
+        self.swaps = 0
+        for i in sorted(self.moved):
+            aabb = self.entities[i].bbox.get_aabb(self.tile_h)
+            for axis in self.AXES:
+                self._move(axis, i, aabb[axis], aabb[axis + 3])
+        self.moved.clear()
+
+        contacts: List[Tuple[Entity, Entity]] = []
+        tested: int = 0
+        for i, j in sorted(self.candidates):
+            a, b = self.entities[i], self.entities[j]
+            if not (a.solid and a.visible and b.solid and b.visible):
+                continue
+            tested += 1
+            if check_entity_collision_3d(a.bbox, b.bbox, self.tile_h):
+                contacts.append((a, b))
+
+        self.pairs_tested = tested
+        self.pairs_found = len(contacts)
+        self.total_tested += tested
+        self.total_found += len(contacts)
+        return contacts
+
+    def _move(self, axis: int, i: int, new_min: float, new_max: float) -> None:
+        """Update an entity's interval on one axis and sift its endpoints into place"""
+        start, end = self.entity_endpoints[axis][i]
+        moving_right: bool = new_min > start.value
+        start.value, end.value = new_min, new_max
+        # Sift the leading endpoint first so the two never cross each other
+        for endpoint in ((end, start) if moving_right else (start, end)):
+            self._sift(axis, endpoint)
+
+    def _sift(self, axis: int, endpoint: Endpoint) -> None:
+        """Insertion sort step: swap an endpoint with its neighbours until sorted"""
+        endpoints: List[Endpoint] = self.endpoints[axis]
+        key: Tuple[float, bool] = endpoint.key()
+        index: int = endpoint.index
+
+        # Moving left past other endpoints
+        while index > 0 and key < endpoints[index - 1].key():
+            other: Endpoint = endpoints[index - 1]
+            if endpoint.is_min and not other.is_min:
+                # Start passes before an end: the intervals now overlap
+                self._add_overlap(endpoint.owner, other.owner)
+            elif not endpoint.is_min and other.is_min:
+                # End passes before a start: the intervals no longer overlap
+                self._remove_overlap(endpoint.owner, other.owner)
+            self._swap(endpoints, index - 1, index)
+            index -= 1
+
+        # Moving right past other endpoints
+        while index < len(endpoints) - 1 and key > endpoints[index + 1].key():
+            other = endpoints[index + 1]
+            if not endpoint.is_min and other.is_min:
+                # End passes after a start: the intervals now overlap
+                self._add_overlap(endpoint.owner, other.owner)
+            elif endpoint.is_min and not other.is_min:
+                # Start passes after an end: the intervals no longer overlap
+                self._remove_overlap(endpoint.owner, other.owner)
+            self._swap(endpoints, index, index + 1)
+            index += 1
+
+    def _swap(self, endpoints: List[Endpoint], left: int, right: int) -> None:
+        endpoints[left], endpoints[right] = endpoints[right], endpoints[left]
+        endpoints[left].index = left
+        endpoints[right].index = right
+        self.swaps += 1
+
+    def _add_overlap(self, i: int, j: int) -> None:
+        pair: Tuple[int, int] = (i, j) if i < j else (j, i)
+        count: int = self.overlap_counts.get(pair, 0) + 1
+        self.overlap_counts[pair] = count
+        if count == len(self.AXES):
+            self.candidates.add(pair)
+
+    def _remove_overlap(self, i: int, j: int) -> None:
+        pair: Tuple[int, int] = (i, j) if i < j else (j, i)
+        count: int = self.overlap_counts[pair] - 1
+        if count:
+            self.overlap_counts[pair] = count
+        else:
+            del self.overlap_counts[pair]
+        self.candidates.discard(pair)
@@ -1,253 +1,325 @@
-from typing import List, Tuple, Optional
-from pygame.math import Vector3
+from typing import Collection, List, Tuple, Optional
+import numpy as np
 from hero import Hero
 from entity import Entity
-from heightmap import Heightmap, HeightmapCell
+from heightmap import Heightmap
+from spatialhash import SpatialHash
+from entityarrays import EntityArrays
 
 # Margin to reduce bounding box size for tighter collision detection
 MARGIN: int = 2
 
+# Swept movement: penetration (pixels) still treated as touching, to absorb rounding
+SWEEP_SKIN: float = 1e-7
+# Swept movement: gap kept before a blocked heightmap cell on its low side. Cells
+# are half-open ([k, k+1) tiles) while hero boxes are closed: the hero may rest
+# exactly on a cell's high edge, but must stay strictly before its low edge
+CELL_EPSILON: float = 1e-6
+# Swept movement: sweeps per call (the first, then one slide along the contact)
+SWEEP_ITERATIONS: int = 2
 
-def check_entity_collision_3d(moving_bbox,
-                              target_bbox,
-                              tile_h: int) -> bool:
-    """Check if two entities collide in 3D space
+
+def check_aabb_collision_3d(min_x: float,
+                            min_y: float,
+                            min_z: float,
+                            max_x: float,
+                            max_y: float,
+                            max_z: float,
+                            target_bbox,
+                            tile_h: int) -> bool:
+    """Check if a raw world AABB collides with a bounding box in 3D space
     
     Args:
-        moving_bbox: BoundingBox of moving entity
+        min_x, min_y, min_z: Lower corner of the moving box (margin applied)
+        max_x, max_y, max_z: Upper corner of the moving box (margin applied)
         target_bbox: BoundingBox of target entity
         tile_h: Tile height in pixels
         
     Returns:
         True if collision detected, False otherwise
     """
-    # Calculate bounding boxes from world positions
-    me_x = moving_bbox.world_pos.x + MARGIN
-    me_y = moving_bbox.world_pos.y + MARGIN
-    me_w = (tile_h * moving_bbox.size_in_tiles) - (MARGIN * 2)
-    me_h = (tile_h * moving_bbox.size_in_tiles) - (MARGIN * 2)
-    
-    te_x = target_bbox.world_pos.x + MARGIN
-    te_y = target_bbox.world_pos.y + MARGIN
-    te_w = (tile_h * target_bbox.size_in_tiles) - (MARGIN * 2)
-    te_h = (tile_h * target_bbox.size_in_tiles) - (MARGIN * 2)
-    
-    # Check XY plane collision (AABB)
-    xy_collision = (me_x < te_x + te_w and
-                    me_x + me_w > te_x and
-                    me_y < te_y + te_h and
-                    me_y + me_h > te_y)
-    
-    if not xy_collision:
-        return False
-    
-    # Check Z axis collision
-    moving_z = moving_bbox.world_pos.z
-    target_z = target_bbox.world_pos.z
-    moving_z_height = moving_bbox.height_in_tiles * tile_h
-    target_z_height = target_bbox.height_in_tiles * tile_h
-    
-    z_collision = (moving_z < target_z + target_z_height and
-                   moving_z + moving_z_height > target_z)
-    
-    return z_collision
+    te_min_x, te_min_y, te_min_z, te_max_x, te_max_y, te_max_z = target_bbox.get_aabb(tile_h)
+    
+    # Check XY plane collision (AABB), then Z axis collision
+    return (min_x < te_max_x and
+            max_x > te_min_x and
+            min_y < te_max_y and
+            max_y > te_min_y and
+            min_z < te_max_z and
+            max_z > te_min_z)
+
+
+def _first_entity(arrays: EntityArrays, mask: np.ndarray) -> Optional[Entity]:
+    """Get the first entity (room order) selected by a batch mask"""
+    i = int(mask.argmax()) if len(mask) else 0
+    return arrays.entities[i] if len(mask) and mask[i] else None
 
 
-def check_collids_entity(hero: Hero,
-                        x: float,
-                        y: float,
-                        entities: List[Entity],
-                        tile_h: int) -> Optional[Entity]:
-    """Check if hero collides with any entity at the given position
+def _highest_entity(arrays: EntityArrays, mask: np.ndarray) -> Tuple[Optional[Entity], Optional[float]]:
+    """Get the first entity (room order) with the highest top among a batch mask, and that top"""
+    if not mask.any():
+        return None, None
+    i = int(np.where(mask, arrays.max_z, -np.inf).argmax())
+    return arrays.entities[i], float(arrays.max_z[i])
+
+
+def check_entity_collision_3d(moving_bbox,
+                              target_bbox,
+                              tile_h: int) -> bool:
+    """Check if two entities collide in 3D space
     
     Args:
-        hero: The hero object
-        x: X position to check
-        y: Y position to check
-        entities: List of entities to check collision against
+        moving_bbox: BoundingBox of moving entity
+        target_bbox: BoundingBox of target entity
         tile_h: Tile height in pixels
         
     Returns:
-        Entity that collides, or None if no collision
+        True if collision detected, False otherwise
     """
-    from boundingbox import BoundingBox
-    
-    hero_pos = hero.get_world_pos()
-    
-    # Create temporary bounding box at new position
-    temp_bbox = BoundingBox(
-        Vector3(x, y, hero_pos.z),
-        hero.bbox.height_in_tiles,
-        hero.bbox.size_in_tiles
-    )
-    
-    for entity in entities:
-        # Check 3D collision
-        if check_entity_collision_3d(temp_bbox, entity.bbox, tile_h):
-            return entity
-    
-    return None
+    return check_aabb_collision_3d(*moving_bbox.get_aabb(tile_h), target_bbox, tile_h)
+
 
-def resolve_entity_collision(hero: Hero,
-                            entities: List[Entity],
-                            new_x: float,
-                            new_y: float,
-                            tile_h: int,
-                            left_offset: int,
-                            top_offset: int,
-                            camera_x: float,
-                            camera_y: float) -> Tuple[float, float, Optional[Entity]]:
-    """Resolve collision between hero and entities when moving to new position
-    
-    This function checks if the hero would collide with any solid entities at the new position.
-    If a collision is detected, it returns the hero's current position instead of the new position.
+def sweep_box(min_x: float,
+              min_y: float,
+              max_x: float,
+              max_y: float,
+              dx: float,
+              dy: float,
+              box: Tuple[float, float, float, float]) -> Tuple[float, int, bool]:
+    """Get the time of impact of a moving box against a static box (XY plane)
+    
+    A box already overlapping the static one by more than SWEEP_SKIN (spawned,
+    warped or landed inside it) may only move out: each motion component must
+    head for the closer side of the static box on its axis, otherwise the
+    motion is blocked at once on that axis.
     
     Args:
-        hero: The hero object
-        entities: List of entities to check collision against
-        new_x: Proposed new X position
-        new_y: Proposed new Y position
-        tile_h: Tile height in pixels
-        left_offset: Heightmap left offset
-        top_offset: Heightmap top offset
-        camera_x: Camera X position
-        camera_y: Camera Y position
+        min_x, min_y, max_x, max_y: Moving box at the start of the motion
+        dx, dy: Motion vector
+        box: Static box (min_x, min_y, max_x, max_y)
         
     Returns:
-        Tuple of (final_x, final_y, touched_entities)
-        - final_x, final_y: Position after collision resolution
-        - touched_entity: entity that were touched during movement
+        Tuple of (time of impact in [0, 1], or 2.0 if no impact;
+        contact normal axis: 0 for X, 1 for Y;
+        True if the boxes touch at the impact, False if blocked from inside)
     """
-    hero_pos = hero.get_world_pos()
-    touched_entity: Entity
-    
-    # Check if new position would cause collision
-    touched_entity = check_collids_entity(hero, new_x, new_y, entities, tile_h)
-    if touched_entity is None:
-        return new_x, new_y, touched_entity
-    
-    # Collision detected, try to slide along obstacles
-    # Try X-only movement
-    touched_entity =  check_collids_entity(hero, new_x, hero_pos.y, entities, tile_h)
-    if touched_entity is None:
-        return new_x, hero_pos.y, touched_entity
-    
-    # Try Y-only movement
-    touched_entity = check_collids_entity(hero, hero_pos.x, new_y, entities, tile_h)
-    if touched_entity is None:
-        return hero_pos.x, new_y, touched_entity
-    
-    return hero_pos.x, hero_pos.y, touched_entity
+    axes = ((min_x, max_x, dx, box[0], box[2]), (min_y, max_y, dy, box[1], box[3]))
+    if all(min(high, box_high) - max(low, box_low) > SWEEP_SKIN
+           for low, high, _, box_low, box_high in axes):
+        # Already inside: block the components going deeper, largest first
+        for axis in sorted((0, 1), key=lambda a: -abs(axes[a][2])):
+            low, high, delta, box_low, box_high = axes[axis]
+            if delta > 0 and box_high - low > high - box_low:
+                return 0.0, axis, False
+            if delta < 0 and high - box_low > box_high - low:
+                return 0.0, axis, False
+        return 2.0, 0, False
+    
+    entry: List[float] = [0.0, 0.0]
+    exit_: List[float] = [0.0, 0.0]
+    for axis, (low, high, delta, box_low, box_high) in enumerate(axes):
+        if delta > 0:
+            gap = box_low - high
+            entry[axis] = max(gap, 0.0) / delta if gap >= -SWEEP_SKIN else -1.0
+            exit_[axis] = (box_high - low) / delta
+        elif delta < 0:
+            gap = low - box_high
+            entry[axis] = max(gap, 0.0) / -delta if gap >= -SWEEP_SKIN else -1.0
+            exit_[axis] = (high - box_low) / -delta
+        elif low < box_high - SWEEP_SKIN and high > box_low + SWEEP_SKIN:
+            # Not moving on this axis: overlapping during the whole motion
+            entry[axis] = -1.0
+            exit_[axis] = float("inf")
+        else:
+            return 2.0, 0, False
+    
+    axis = 0 if entry[0] >= entry[1] else 1
+    toi = entry[axis]
+    if toi < 0.0 or toi > 1.0 or toi >= min(exit_):
+        # Out of reach, or only passing by the corner
+        return 2.0, 0, False
+    return toi, axis, True
 
 
-def get_entity_top_at_position(entities: List[Entity],
-                               check_x: float,
-                               check_y: float,
-                               check_width: float,
-                               check_height: float,
-                               hero_z: float,
-                               tile_h: int) -> Optional[float]:
-    """Get the highest entity surface under the given position
-    
-    This is used for gravity calculations to check if hero is standing on an entity.
+def sweep_hero_movement(hero: Hero,
+                        dx: float,
+                        dy: float,
+                        entity_hash: SpatialHash,
+                        heightmap: Heightmap,
+                        tile_h: int) -> Tuple[float, float, Optional[Entity]]:
+    """Move the hero along a motion vector, stopping at the first obstacle and sliding along it
+    
+    Swept AABB against the blocked heightmap cells (outside the map, not walkable,
+    or higher than the hero's feet) and the entity boxes overlapping the hero in Z:
+    the hero cannot tunnel through thin obstacles whatever the speed.
     
     Args:
-        entities: List of entities to check
-        check_x: X position to check
-        check_y: Y position to check
-        check_width: Width of area to check
-        check_height: Height of area to check
-        hero_z: Hero's current Z position (feet level)
+        hero: The hero object
+        dx: X motion in world pixels
+        dy: Y motion in world pixels
+        entity_hash: Spatial hash of the entities to collide with
+        heightmap: The heightmap for terrain checks
         tile_h: Tile height in pixels
         
     Returns:
-        Z position of highest entity top, or None if no entity below
+        Tuple of (final_x, final_y, touched_entity)
+        - final_x, final_y: Hero world position after the motion
+        - touched_entity: first entity hit during the motion, or None
     """
-    highest_top: Optional[float] = None
-    
-    for entity in entities:
-        if not entity.solid or not entity.visible:
-            continue
-        
-        # Get entity bounding box
-        entity_x = entity.bbox.world_pos.x + MARGIN
-        entity_y = entity.bbox.world_pos.y + MARGIN
-        entity_w = (tile_h * entity.bbox.size_in_tiles) - (MARGIN * 2)
-        entity_h = (tile_h * entity.bbox.size_in_tiles) - (MARGIN * 2)
-        
-        # Check XY overlap
-        xy_overlap = (check_x < entity_x + entity_w and
-                     check_x + check_width > entity_x and
-                     check_y < entity_y + entity_h and
-                     check_y + check_height > entity_y)
+    hero_pos = hero.get_world_pos()
+    hero_z = hero_pos.z
+    min_x, min_y, width, height = hero.get_bounding_box(tile_h)
+    
+    # Obstacles in reach of the whole motion, with the entity they belong to
+    reach_x0, reach_x1 = min(min_x, min_x + dx), max(min_x, min_x + dx) + width
+    reach_y0, reach_y1 = min(min_y, min_y + dy), max(min_y, min_y + dy) + height
+    obstacles: List[Tuple[Tuple[float, float, float, float], Optional[Entity]]] = []
+    
+    left, top, right, bottom = Heightmap.get_cell_rect(
+        reach_x0, reach_y0, reach_x1 - reach_x0 + CELL_EPSILON, reach_y1 - reach_y0 + CELL_EPSILON, tile_h)
+    if not (heightmap.is_rect_walkable(left, top, right, bottom) and
+            heightmap.get_max_height_in_rect(left, top, right, bottom) * tile_h <= hero_z):
+        for cell_y in range(top, bottom + 1):
+            for cell_x in range(left, right + 1):
+                if (heightmap.is_rect_walkable(cell_x, cell_y, cell_x, cell_y) and
+                        int(heightmap.heights[cell_y, cell_x]) * tile_h <= hero_z):
+                    continue
+                obstacles.append(((cell_x * tile_h - CELL_EPSILON, cell_y * tile_h - CELL_EPSILON,
+                                   (cell_x + 1) * tile_h, (cell_y + 1) * tile_h), None))
+    
+    hero_top = hero_z + hero.bbox.height_in_tiles * tile_h
+    arrays = entity_hash.arrays
+    if arrays is not None:
+        # Entities in reach (touching included) overlapping the hero in Z
+        mask = arrays.overlap_3d(reach_x0 - SWEEP_SKIN, reach_y0 - SWEEP_SKIN, hero_z,
+                                 reach_x1 + SWEEP_SKIN, reach_y1 + SWEEP_SKIN, hero_top)
+        arrays.exclude(mask, hero.grabbed_entity)
+        for i in np.flatnonzero(mask):
+            obstacles.append(((float(arrays.min_x[i]), float(arrays.min_y[i]),
+                               float(arrays.max_x[i]), float(arrays.max_y[i])), arrays.entities[i]))
+    else:
+        for entity in entity_hash.query(reach_x0, reach_y0, reach_x1 - reach_x0, reach_y1 - reach_y0):
+            if entity is hero.grabbed_entity:
+                continue
+            entity_x, entity_y, entity_z, entity_max_x, entity_max_y, entity_max_z = entity.bbox.get_aabb(tile_h)
+            # Only entities overlapping the hero in Z block it
+            if hero_z < entity_max_z and hero_top > entity_z:
+                obstacles.append(((entity_x, entity_y, entity_max_x, entity_max_y), entity))
+    
+    touched_entity: Optional[Entity] = None
+    x, y = hero_pos.x, hero_pos.y
+    for _ in range(SWEEP_ITERATIONS):
+        if not dx and not dy:
+            break
         
-        if not xy_overlap:
-            continue
+        # Earliest impact along the remaining motion
+        toi: float = 2.0
+        axis: int = 0
+        hit_box: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0)
+        contact: bool = False
+        hit: Optional[Entity] = None
+        for box, entity in obstacles:
+            box_toi, box_axis, box_contact = sweep_box(min_x, min_y, min_x + width, min_y + height, dx, dy, box)
+            if box_toi < toi:
+                toi, axis, hit_box, contact, hit = box_toi, box_axis, box, box_contact, entity
         
-        # Calculate entity top Z position
-        entity_top = entity.bbox.world_pos.z + (entity.bbox.height_in_tiles * tile_h)
+        if toi > 1.0:
+            x, y = x + dx, y + dy
+            break
         
-        # Only consider entities below hero (with small tolerance)
-        if entity_top <= hero_z + 1.0:
-            if highest_top is None or entity_top > highest_top:
-                highest_top = entity_top
-    
-    return highest_top
+        # Move to the contact, snapped onto the obstacle face so rounding never
+        # leaves the hero inside it (not when blocked from inside: toi is 0),
+        # then slide: keep the motion along the face
+        if touched_entity is None:
+            touched_entity = hit
+        if axis == 0:
+            if contact:
+                x = (hit_box[2] if dx < 0 else hit_box[0] - width) - MARGIN
+            y = y + dy * toi
+            dx, dy = 0.0, dy * (1.0 - toi)
+        else:
+            x = x + dx * toi
+            if contact:
+                y = (hit_box[3] if dy < 0 else hit_box[1] - height) - MARGIN
+            dx, dy = dx * (1.0 - toi), 0.0
+        min_x, min_y = x + MARGIN, y + MARGIN
+    
+    return x, y, touched_entity
+
 
-def get_entity_hero_is_standing_on(hero: Hero,
-                                   entities: List[Entity],
-                                   tile_h: int) -> Optional[Entity]:
-    """Get the entity that the hero is currently standing on
+def get_ground_below_hero(hero: Hero,
+                          entity_hash: SpatialHash,
+                          heightmap: Heightmap,
+                          tile_h: int,
+                          exclude: Collection[Entity] = ()) -> Tuple[float, Optional[Entity], float]:
+    """Get the surface supporting the hero, terrain and entities, in a single pass
     
-    This checks which entity surface the hero is directly on top of.
+    The highest entity top at or below the hero's feet (with small tolerance)
+    is both the entity surface and, when the feet rest on it, the entity
+    the hero stands on.
     
     Args:
         hero: The hero object
-        entities: List of entities to check
+        entity_hash: Spatial hash of the entities to check
+        heightmap: The heightmap for terrain height
         tile_h: Tile height in pixels
+        exclude: Entities to ignore (e.g. the grabbed entity)
         
     Returns:
-        Entity hero is standing on, or None if not on any entity
+        Tuple of (surface_z, standing_on, terrain_z)
+        - surface_z: Z of the highest surface under the hero (terrain or entity)
+        - standing_on: Entity the hero is standing on, or None
+        - terrain_z: Z of the highest terrain cell under the hero
     """
-    hero_pos = hero.get_world_pos()
-    hero_bbox = hero.get_bounding_box(tile_h)
-    check_x, check_y, check_width, check_height = hero_bbox
+    hero_z = hero.get_world_pos().z
+    check_x, check_y, check_width, check_height = hero.get_bounding_box(tile_h)
+    
+    terrain_z: float = heightmap.get_max_height_in_rect(
+        *Heightmap.get_cell_rect(check_x, check_y, check_width, check_height, tile_h)
+    ) * tile_h
     
     highest_entity: Optional[Entity] = None
     highest_top: Optional[float] = None
     
+    arrays = entity_hash.arrays
+    if arrays is not None:
+        mask = (arrays.solid & arrays.visible &
+                arrays.overlap_xy(check_x, check_y, check_x + check_width, check_y + check_height) &
+                (arrays.max_z <= hero_z + 1.0))
+        highest_entity, highest_top = _highest_entity(arrays, arrays.exclude(mask, *exclude))
+        entities = ()
+    else:
+        entities = entity_hash.query(check_x, check_y, check_width, check_height)
+    
     for entity in entities:
-        # Skip non-solid, invisible, and grabbed entities
-        if not entity.solid or not entity.visible or entity is hero.grabbed_entity:
+        if not entity.solid or not entity.visible or entity in exclude:
             continue
         
-        # Get entity bounding box
-        entity_x = entity.bbox.world_pos.x + MARGIN
-        entity_y = entity.bbox.world_pos.y + MARGIN
-        entity_w = (tile_h * entity.bbox.size_in_tiles) - (MARGIN * 2)
-        entity_h = (tile_h * entity.bbox.size_in_tiles) - (MARGIN * 2)
+        # Get entity bounding box (cached)
+        entity_x, entity_y, entity_z, entity_max_x, entity_max_y, entity_top = entity.bbox.get_aabb(tile_h)
         
         # Check XY overlap
-        xy_overlap = (check_x < entity_x + entity_w and
+        xy_overlap = (check_x < entity_max_x and
                      check_x + check_width > entity_x and
-                     check_y < entity_y + entity_h and
+                     check_y < entity_max_y and
                      check_y + check_height > entity_y)
         
         if not xy_overlap:
             continue
         
-        # Calculate entity top Z position
-        entity_top = entity.bbox.world_pos.z + (entity.bbox.height_in_tiles * tile_h)
-        
-        # Check if hero is standing on this entity (hero's feet are at entity's top)
-        # Allow small tolerance for floating point precision
-        if abs(hero_pos.z - entity_top) <= 1.0:
+        # Only consider entities below hero (with small tolerance)
+        if entity_top <= hero_z + 1.0:
             if highest_top is None or entity_top > highest_top:
                 highest_top = entity_top
                 highest_entity = entity
     
-    return highest_entity
+    if highest_top is None:
+        return terrain_z, None, terrain_z
     
+    # Hero's feet are at the entity's top
+    standing_on: Optional[Entity] = highest_entity if hero_z - highest_top <= 1.0 else None
+    return max(terrain_z, highest_top), standing_on, terrain_z
+
 def get_position_in_front_of_hero(hero: Hero, tile_h: int) -> Tuple[float, float]:
     """Get the position one tile in front of the hero based on facing direction
     
@@ -275,13 +347,13 @@ def get_position_in_front_of_hero(hero: Hero, tile_h: int) -> Tuple[float, float
 
 
 def get_entity_in_front_of_hero(hero: Hero,
-                                entities: List[Entity],
+                                entity_hash: SpatialHash,
                                 tile_h: int) -> Optional[Entity]:
     """Get the entity directly in front of the hero (for interactions)
     
     Args:
         hero: The hero object
-        entities: List of entities to check
+        entity_hash: Spatial hash of the entities to check
         tile_h: Tile height in pixels
         
     Returns:
@@ -293,32 +365,35 @@ def get_entity_in_front_of_hero(hero: Hero,
     # Create a small bounding box at the position in front
     check_size = tile_h * 0.8  # Slightly smaller than full tile for better detection
     
-    for entity in entities:
+    arrays = entity_hash.arrays
+    if arrays is not None:
+        hero_height = hero.bbox.height_in_tiles * tile_h
+        mask = arrays.visible & arrays.overlap_3d(front_x, front_y, hero_pos.z,
+                                                  front_x + check_size, front_y + check_size,
+                                                  hero_pos.z + hero_height)
+        return _first_entity(arrays, arrays.exclude(mask, hero.grabbed_entity))
+    
+    for entity in entity_hash.query(front_x, front_y, check_size, check_size):
         if not entity.visible or entity is hero.grabbed_entity:
             continue
         
-        # Get entity bounding box
-        entity_x = entity.bbox.world_pos.x + MARGIN
-        entity_y = entity.bbox.world_pos.y + MARGIN
-        entity_w = (tile_h * entity.bbox.size_in_tiles) - (MARGIN * 2)
-        entity_h = (tile_h * entity.bbox.size_in_tiles) - (MARGIN * 2)
+        # Get entity bounding box (cached)
+        entity_x, entity_y, entity_z, entity_max_x, entity_max_y, entity_max_z = entity.bbox.get_aabb(tile_h)
         
         # Check if position in front overlaps with entity
-        overlap = (front_x < entity_x + entity_w and
+        overlap = (front_x < entity_max_x and
                   front_x + check_size > entity_x and
-                  front_y < entity_y + entity_h and
+                  front_y < entity_max_y and
                   front_y + check_size > entity_y)
         
         if not overlap:
             continue
         
         # Check Z overlap (hero should be at similar height to interact)
-        entity_z = entity.bbox.world_pos.z
-        entity_height = entity.bbox.height_in_tiles * tile_h
         hero_height = hero.bbox.height_in_tiles * tile_h
         
         # Allow interaction if hero and entity Z ranges overlap
-        z_overlap = (hero_pos.z < entity_z + entity_height and
+        z_overlap = (hero_pos.z < entity_max_z and
                     hero_pos.z + hero_height > entity_z)
         
         if z_overlap:
@@ -327,11 +402,30 @@ def get_entity_in_front_of_hero(hero: Hero,
     return None
 
 
+def get_entity_footprint(entity: Entity,
+                         x: float,
+                         y: float,
+                         tile_h: int) -> Tuple[float, float, float, float]:
+    """Get the ground footprint of an entity if it stood at the given position
+    
+    Args:
+        entity: Entity to measure
+        x: X position to check
+        y: Y position to check
+        tile_h: Tile height in pixels
+        
+    Returns:
+        Tuple of (x, y, width, height) in world pixels, margins applied
+    """
+    size: float = tile_h * entity.bbox.size_in_tiles - MARGIN * 2
+    return (x + MARGIN, y + MARGIN, size, size)
+
+
 def can_place_entity_at_position(entity: Entity,
                                  x: float,
                                  y: float,
                                  z: float,
-                                 other_entities: List[Entity],
+                                 entity_hash: SpatialHash,
                                  heightmap: Heightmap,
                                  tile_h: int) -> bool:
     """Check if an entity can be placed at the given position
@@ -341,54 +435,46 @@ def can_place_entity_at_position(entity: Entity,
         x: X position to check
         y: Y position to check
         z: Z position to check
-        other_entities: List of other entities to check collision against
+        entity_hash: Spatial hash of the entities to check collision against
         heightmap: The heightmap for terrain checks
         tile_h: Tile height in pixels
         
     Returns:
         True if entity can be placed, False otherwise
     """
-    from boundingbox import BoundingBox
-    
-    # Check if position is in bounds
-    tile_x = int(x // tile_h)
-    tile_y = int(y // tile_h)
-    
-    if (tile_x < 0 or tile_y < 0 or
-        tile_x >= heightmap.get_width() or
-        tile_y >= heightmap.get_height()):
+    # Cells under the entity footprint, all inside the map and walkable
+    min_x, min_y, width, height = get_entity_footprint(entity, x, y, tile_h)
+    footprint = Heightmap.get_cell_rect(min_x, min_y, width, height, tile_h)
+    if not heightmap.is_rect_walkable(*footprint):
         return False
     
-    # Check if terrain is walkable
-    cell: Optional[HeightmapCell] = heightmap.get_cell(tile_x, tile_y)
-    if not cell or not cell.is_walkable():
-        return False
-    
-    # Check if Z matches terrain height (entity should be on ground)
-    terrain_z = cell.height * tile_h
+    # Check if Z matches terrain height (entity should rest on the highest cell)
+    terrain_z = heightmap.get_max_height_in_rect(*footprint) * tile_h
     if abs(z - terrain_z) > 1.0:  # Small tolerance for floating point
         return False
     
-    # Create temporary bounding box for collision check
-    temp_bbox = BoundingBox(
-        Vector3(x, y, z),
-        entity.bbox.height_in_tiles,
-        entity.bbox.size_in_tiles
-    )
+    # Check collision with other entities, entity box at the new position
+    max_x = min_x + width
+    max_y = min_y + height
+    max_z = z + entity.bbox.height_in_tiles * tile_h
+    
+    arrays = entity_hash.arrays
+    if arrays is not None:
+        mask = arrays.solid & arrays.visible & arrays.overlap_3d(min_x, min_y, z, max_x, max_y, max_z)
+        return not arrays.exclude(mask, entity).any()
     
-    # Check collision with other entities
-    for other in other_entities:
+    for other in entity_hash.query(min_x, min_y, width, height):
         if other is entity or not other.solid or not other.visible:
             continue
         
-        if check_entity_collision_3d(temp_bbox, other.bbox, tile_h):
+        if check_aabb_collision_3d(min_x, min_y, z, max_x, max_y, max_z, other.bbox, tile_h):
             return False
     
     return True
 
 
 def get_touching_entities(hero: Hero,
-                         entities: List[Entity],
+                         entity_hash: SpatialHash,
                          tile_h: int) -> List[Entity]:
     """Get all entities currently touching the hero in 3D space
     
@@ -397,7 +483,7 @@ def get_touching_entities(hero: Hero,
     
     Args:
         hero: The hero object
-        entities: List of entities to check collision against
+        entity_hash: Spatial hash of the entities to check collision against
         tile_h: Tile height in pixels
         
     Returns:
@@ -405,7 +491,13 @@ def get_touching_entities(hero: Hero,
     """
     touching_entities: List[Entity] = []
     
-    for entity in entities:
+    arrays = entity_hash.arrays
+    if arrays is not None:
+        mask = arrays.visible & arrays.overlap_3d(*hero.bbox.get_aabb(tile_h))
+        arrays.exclude(mask, hero.grabbed_entity)
+        return [arrays.entities[i] for i in np.flatnonzero(mask)]
+    
+    for entity in entity_hash.query(*hero.get_bounding_box(tile_h)):
         if entity is hero.grabbed_entity:
             # Skip grabbed entity (it's supposed to be touching)
             continue
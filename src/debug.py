@@ -2,6 +2,7 @@ import pygame
 from typing import List
 from utils import cartesian_to_iso
 from boundingbox import BoundingBox
+from heightmap import WALKABLE_LIMIT
 
 
 # -------------------------------------------------------------
@@ -16,10 +17,11 @@ def draw_heightmap(screen, heightmap, tile_height, camera_x, camera_y):
     # Create a temporary surface for transparency
     temp_surface = pygame.Surface(screen.get_size(), pygame.SRCALPHA)
 
-    for y, row in enumerate(heightmap.cells):
-        for x, cell in enumerate(row):
+    heights = heightmap.heights.tolist()
+    walkables = heightmap.walkables.tolist()
 
-            height = cell.height
+    for y, row in enumerate(heights):
+        for x, height in enumerate(row):
 
             # Compute four corners of tile
             left_x, left_y = cartesian_to_iso(
@@ -48,7 +50,7 @@ def draw_heightmap(screen, heightmap, tile_height, camera_x, camera_y):
             ]
 
             # Choose color by conditions
-            if cell.walkable >= 4:
+            if walkables[y][x] >= WALKABLE_LIMIT:
                 # Non-walkable - red
                 outline_color = (255, 80, 80)
                 fill_color = (255, 80, 80, 80)
@@ -73,8 +75,8 @@ def draw_heightmap(screen, heightmap, tile_height, camera_x, camera_y):
             pygame.draw.lines(screen, outline_color, True, points, 1)
 
             # Draw vertical edges if tile in front or below is lower
-            if x < len(heightmap.cells[0]) - 1:
-                neighbor_h = heightmap.cells[y][x + 1].height
+            if x < len(row) - 1:
+                neighbor_h = row[x + 1]
                 if neighbor_h < height:
                     hdiff = neighbor_h - height
                     
@@ -100,8 +102,8 @@ def draw_heightmap(screen, heightmap, tile_height, camera_x, camera_y):
                         (right_x - camera_x, right_y - camera_y - neighbor_h * tile_height)
                     )
 
-            if y < len(heightmap.cells) - 1:
-                neighbor_h = heightmap.cells[y + 1][x].height
+            if y < len(heights) - 1:
+                neighbor_h = heights[y + 1][x]
                 if neighbor_h < height:
                     hdiff = neighbor_h - height
                     
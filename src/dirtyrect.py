@@ -0,0 +1,73 @@
+import pygame
+from typing import Any, Dict, Hashable, List, Optional, Tuple
+
+
+class DirtyRectTracker:
+    """Tracks which screen regions changed between two presented frames"""
+
+    def __init__(self) -> None:
+        # Key -> (rect, state) of every tracked region in the last presented frame
+        self._previous: Dict[Hashable, Tuple[pygame.Rect, Any]] = {}
+        self._current: Dict[Hashable, Tuple[pygame.Rect, Any]] = {}
+        self._view_key: Any = None
+        self._full: bool = True
+
+    def mark_all(self) -> None:
+        """Force the next frame to be presented in full"""
+        self._full = True
+
+    def set_view(self, view_key: Any) -> None:
+        """Set the state shared by the whole frame (camera, room, fade, overlays...)
+
+        Any change of this key invalidates the whole frame.
+
+        Args:
+            view_key: Hashable snapshot of the frame-wide state
+        """
+        if view_key != self._view_key:
+            self._view_key = view_key
+            self._full = True
+
+    def track(self, key: Hashable, rect: pygame.Rect, state: Any = None) -> None:
+        """Register a region drawn this frame
+
+        The region is dirty if it moved, resized, changed state or is new.
+
+        Args:
+            key: Identifier of the drawn object
+            rect: Screen rect covered by the object
+            state: Snapshot of what the object looks like (animation frame, text...)
+        """
+        self._current[key] = (pygame.Rect(rect), state)
+
+    def collect(self, bounds: pygame.Rect) -> Optional[List[pygame.Rect]]:
+        """Get the dirty regions of this frame and start tracking the next one
+
+        Args:
+            bounds: Rect of the whole frame, dirty regions are clipped to it
+
+        Returns:
+            None if the whole frame must be presented, otherwise the list of
+            dirty rects (empty when nothing changed)
+        """
+        dirty: List[pygame.Rect] = []
+        if not self._full:
+            for key, (rect, state) in self._current.items():
+                previous = self._previous.get(key)
+                if previous is None:
+                    dirty.append(rect)
+                elif previous[0] != rect or previous[1] != state:
+                    dirty.append(previous[0])
+                    dirty.append(rect)
+            for key, (rect, _) in self._previous.items():
+                if key not in self._current:
+                    dirty.append(rect)
+
+        full: bool = self._full
+        self._previous = self._current
+        self._current = {}
+        self._full = False
+
+        if full:
+            return None
+        return [rect.clip(bounds) for rect in dirty if rect.colliderect(bounds)]
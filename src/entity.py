@@ -1,8 +1,9 @@
-from typing import Dict, Any, Optional, Tuple, List, ClassVar
+from typing import Dict, Any, Optional, Tuple, List, ClassVar, Callable
 import pygame
 from pygame.math import Vector2, Vector3
 from boundingbox import BoundingBox
 from utils import cartesian_to_iso
+from surfaceformat import SurfaceFormatStats, optimize_surface
 import yaml
 import os
 
@@ -13,6 +14,9 @@ class Entity:
     # Class-level sprite cache - shared across all instances
     _sprite_cache: ClassVar[Dict[str, pygame.Surface]] = {}
     
+    # Class-level cache of the format-optimized frames of each sprite sheet
+    _frames_cache: ClassVar[Dict[str, List[pygame.Surface]]] = {}
+    
     # Sprite properties cache - loaded from YAML files
     _sprite_properties_cache: ClassVar[Dict[int, Dict[str, Any]]] = {}
     
@@ -113,6 +117,8 @@ class Entity:
         
         # World position (will be calculated based on tile size)
         self.world_pos: Optional[Vector3] = None
+        # Position at the previous simulation tick, for render interpolation
+        self._prev_world_pos: Optional[Vector3] = None
         self._screen_pos: Vector2 = Vector2()
         
         # Physical properties (size in tiles, height in tiles, volume)
@@ -130,6 +136,10 @@ class Entity:
         # Bounding box for collision detection (initialized after world_pos is set)
         self.bbox: Optional[BoundingBox] = None
         
+        # Called with the entity each time it moves or its solid/visible flags
+        # change (e.g. spatial hash update)
+        self.move_listeners: List[Callable[['Entity'], None]] = []
+        
         # Visual properties
         self.palette: int = data.get('Palette', 0)
         self.orientation: str = data.get('Orientation', 'NE')
@@ -157,8 +167,8 @@ class Entity:
         self.no_rotate: bool = data.get('NoRotate', False)
         self.no_pickup: bool = data.get('NoPickup', False)
         self.has_dialogue: bool = data.get('HasDialogue', False)
-        self.visible: bool = data.get('Visible', True)
-        self.solid: bool = data.get('Solid', True)
+        self._visible: bool = data.get('Visible', True)
+        self._solid: bool = data.get('Solid', True)
         self.gravity: bool = data.get('Gravity', True)
         self.friction: bool = data.get('Friction', True)
         self.reserved: bool = data.get('Reserved', False)
@@ -201,7 +211,12 @@ class Entity:
                 return
             
             # Extract individual frames from the sprite sheet
-            self._extract_frames()
+            if sprite_file not in Entity._frames_cache:
+                self._extract_frames()
+                Entity._frames_cache[sprite_file] = self.frames
+            self.frames = Entity._frames_cache[sprite_file]
+            if self.frames:
+                self.image = self.frames[0]
             
         else:
             # No sprite mapping for this entity class - mark as missing
@@ -214,14 +229,17 @@ class Entity:
             return
         
         sprite_height = self.sprite_sheet.get_height()
+        stats = SurfaceFormatStats()
         
-        # Extract each frame
+        # Extract each frame, converted to its fastest blit format
         for i in range(self.frame_count):
             x = i * self.frame_width
             frame = self.sprite_sheet.subsurface(
                 pygame.Rect(x, 0, self.frame_width, sprite_height)
             )
-            self.frames.append(frame)
+            self.frames.append(optimize_surface(frame, stats))
+        
+        print(f"Surface formats for {self.name}: {stats}")
         
         # Set initial frame
         if self.frames:
@@ -265,9 +283,55 @@ class Entity:
         # Initialize bounding box after world position is set
         # Use the entity's size property for the bounding box
         self.bbox = BoundingBox(self.world_pos, self.height, self.size)
+        self.notify_moved()
+    
+    def set_position(self, world_pos: Vector3) -> None:
+        """Move the entity to a world position
+        
+        Args:
+            world_pos: New position in world coordinates
+        """
+        self.world_pos = world_pos
+        if self.bbox is None:
+            self.bbox = BoundingBox(self.world_pos, self.height, self.size)
+        else:
+            self.bbox.update_position(self.world_pos)
+        self.notify_moved()
+    
+    @property
+    def visible(self) -> bool:
+        return self._visible
+    
+    @visible.setter
+    def visible(self, visible: bool) -> None:
+        self._visible = visible
+        self.notify_moved()
+    
+    @property
+    def solid(self) -> bool:
+        return self._solid
+    
+    @solid.setter
+    def solid(self, solid: bool) -> None:
+        self._solid = solid
+        self.notify_moved()
+    
+    def notify_moved(self) -> None:
+        """Tell the move listeners that the entity position or collision flags changed"""
+        for listener in self.move_listeners:
+            listener(self)
+    
+    def store_previous_pos(self) -> None:
+        """Remember the current position as the previous tick one (call before each simulation tick)"""
+        if self.world_pos is None:
+            return
+        if self._prev_world_pos is None:
+            self._prev_world_pos = Vector3(self.world_pos)
+        else:
+            self._prev_world_pos.update(self.world_pos)
     
     def update_screen_pos(self, heightmap_left_offset: int, heightmap_top_offset: int,
-                         camera_x: float, camera_y: float, tile_h: int) -> None:
+                         camera_x: float, camera_y: float, tile_h: int, alpha: float = 1.0) -> None:
         """Update screen position based on world position and camera
         
         Args:
@@ -276,34 +340,47 @@ class Entity:
             camera_x: Camera X position
             camera_y: Camera Y position
             tile_h: Tile height in pixels
+            alpha: Blend factor between the previous tick position (0) and the current one (1)
         """
         if self.world_pos is None:
             return
-        
+        screen_x, screen_y = self._project(self.world_pos, heightmap_left_offset, heightmap_top_offset, tile_h)
+        if alpha < 1.0 and self._prev_world_pos is not None:
+            # Blend the projected positions, as the camera is blended
+            prev_x, prev_y = self._project(self._prev_world_pos, heightmap_left_offset, heightmap_top_offset, tile_h)
+            screen_x = prev_x + (screen_x - prev_x) * alpha
+            screen_y = prev_y + (screen_y - prev_y) * alpha
+        
+        self._screen_pos.x = screen_x - camera_x
+        self._screen_pos.y = screen_y - camera_y
+    
+    @staticmethod
+    def _project(world_pos: Vector3, heightmap_left_offset: int, heightmap_top_offset: int,
+                 tile_h: int) -> Tuple[float, float]:
+        """Project a world position to the screen, camera not applied"""
         offset_x: float = (heightmap_left_offset - 12 + 4) * tile_h
         offset_y: float = (heightmap_top_offset - 11 + 4) * tile_h
         
         iso_x: float
         iso_y: float
         iso_x, iso_y = cartesian_to_iso(
-            self.world_pos.x - offset_x,
-            self.world_pos.y - offset_y
+            world_pos.x - offset_x,
+            world_pos.y - offset_y
         )
         
         ENTITY_HEIGHT: int = 32  # Adjust based on sprite
         
-        self._screen_pos.x = iso_x - 16 - camera_x
-        self._screen_pos.y = iso_y - self.world_pos.z + 12 - camera_y + ENTITY_HEIGHT
+        return iso_x - 16, iso_y - world_pos.z + 12 + ENTITY_HEIGHT
     
-    def draw(self, surface: pygame.Surface) -> None:
-        """Draw the entity on the surface
+    def get_draw_item(self) -> Optional[Tuple[pygame.Surface, Tuple[float, float]]]:
+        """Get the (image, position) pair to submit in a batched draw call
         
-        Args:
-            surface: Pygame surface to draw on
+        Returns:
+            Draw item, or None if the entity is not drawn
         """
-        # Only draw sprite if it exists and is visible
         if self.image and self.visible and not self.sprite_missing:
-            surface.blit(self.image, self._screen_pos)
+            return (self.image, (self._screen_pos.x, self._screen_pos.y))
+        return None
     
     def get_bounding_box(self, tile_h: int) -> Tuple[float, float, float, float]:
         """Get entity's bounding box in world coordinates with margin applied
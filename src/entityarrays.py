@@ -0,0 +1,104 @@
+from typing import Dict, List
+
+import numpy as np
+
+from entity import Entity
+
+# Rooms whose most crowded tile cell holds at least this many entities answer
+# collision queries with the vectorized kernels over all entities. Below it,
+# the per-entity loops over the few spatial hash candidates are cheaper than
+# the NumPy call overhead (~20 us per query whatever the entity count)
+BATCH_MIN_CELL_ENTITIES: int = 16
+
+
+class EntityArrays:
+    """Structure-of-arrays copy of the entity collision state
+
+    One row per entity, in room order: the cached world AABB of its bounding
+    box (margins applied) and its solid/visible flags. Rows are refreshed
+    from the entities' move listeners, so a query over every entity is a
+    handful of vectorized comparisons.
+    """
+
+    def __init__(self, entities: List[Entity], tile_h: int) -> None:
+        """Build the arrays
+
+        Args:
+            entities: Entities with an initialized bounding box, in room order
+            tile_h: Tile height in pixels
+        """
+        self.entities: List[Entity] = list(entities)
+        self.tile_h: int = tile_h
+        self.index: Dict[Entity, int] = {entity: i for i, entity in enumerate(self.entities)}
+
+        count: int = len(self.entities)
+        self.min_x: np.ndarray = np.zeros(count)
+        self.min_y: np.ndarray = np.zeros(count)
+        self.min_z: np.ndarray = np.zeros(count)
+        self.max_x: np.ndarray = np.zeros(count)
+        self.max_y: np.ndarray = np.zeros(count)
+        self.max_z: np.ndarray = np.zeros(count)
+        self.solid: np.ndarray = np.zeros(count, dtype=bool)
+        self.visible: np.ndarray = np.zeros(count, dtype=bool)
+        for entity in self.entities:
+            self.update(entity)
+
+    def __len__(self) -> int:
+        return len(self.entities)
+
+    def update(self, entity: Entity) -> None:
+        """Copy the current AABB and flags of an entity into its row
+
+        Args:
+            entity: Entity that moved or changed flags
+        """
+        i = self.index.get(entity)
+        if i is None:
+            return
+        (self.min_x[i], self.min_y[i], self.min_z[i],
+         self.max_x[i], self.max_y[i], self.max_z[i]) = entity.bbox.get_aabb(self.tile_h)
+        self.solid[i] = entity.solid
+        self.visible[i] = entity.visible
+
+    def overlap_xy(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        """Get which entities strictly overlap a rectangle in the XY plane
+
+        Args:
+            min_x, min_y: Top-left corner in world pixels
+            max_x, max_y: Bottom-right corner in world pixels
+
+        Returns:
+            Boolean array, one value per entity
+        """
+        return ((min_x < self.max_x) & (max_x > self.min_x) &
+                (min_y < self.max_y) & (max_y > self.min_y))
+
+    def overlap_3d(self, min_x: float, min_y: float, min_z: float,
+                   max_x: float, max_y: float, max_z: float) -> np.ndarray:
+        """Get which entities strictly overlap a box in 3D space
+
+        Args:
+            min_x, min_y, min_z: Lower corner in world pixels
+            max_x, max_y, max_z: Upper corner in world pixels
+
+        Returns:
+            Boolean array, one value per entity
+        """
+        return (self.overlap_xy(min_x, min_y, max_x, max_y) &
+                (min_z < self.max_z) & (max_z > self.min_z))
+
+    def exclude(self, mask: np.ndarray, *entities: Entity) -> np.ndarray:
+        """Clear the rows of some entities in a mask (in place)
+
+        Args:
+            mask: Boolean array, one value per entity
+            entities: Entities to clear (None and unknown entities are ignored)
+
+        Returns:
+            The mask
+        """
+        for entity in entities:
+            i = self.index.get(entity)
+            if i is not None:
+                mask[i] = False
+        return mask
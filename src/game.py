@@ -1,5 +1,7 @@
 from pygame.math import Vector3
+import os
 import sys
+import time
 import argparse
 from typing import List, Tuple, Optional, Callable
 import yaml
@@ -9,30 +11,50 @@ import pygame_gui
 from pygame_gui.elements.ui_text_box import UITextBox
 
 from hero import Hero
+from entity import Entity
 from utils import *
 from tiledmap import Tiledmap
+from warp import Warp
+from roomloader import RoomLoader
 from heightmap import Heightmap, HeightmapCell
+from dirtyrect import DirtyRectTracker
+from scaler import Scaler
 from debug import draw_hero_boundbox, draw_heightmap, draw_warps, draw_entities_boundboxes
-from collision import (resolve_entity_collision, get_entity_top_at_position, check_collids_entity, get_entity_hero_is_standing_on,
-                      get_entity_in_front_of_hero, can_place_entity_at_position, get_position_in_front_of_hero, get_touching_entities)
+from collision import (sweep_hero_movement, get_ground_below_hero,
+                      get_entity_in_front_of_hero, can_place_entity_at_position, get_position_in_front_of_hero,
+                      get_entity_footprint)
 from script_commands import run_entity_script
 
 # Constants
 DISPLAY_HEIGHT: int = 224
 DISPLAY_WIDTH: int = 320
-CAMERA_SPEED: int = 5
-GRAVITY: float = 2.5
-HERO_SPEED: float = 1.75
+# Speeds in world pixels per second, applied once per simulation tick
+CAMERA_SPEED: float = 300.0
+GRAVITY: float = 150.0
+HERO_SPEED: float = 105.0
+HERO_JUMP_SPEED: float = 120.0
 HERO_MAX_JUMP: int = 24
+# Default simulation ticks per second and rendered frames per second cap
+TICK_RATE: int = 60
 FPS: int = 60
+# Longest frame time fed to the simulation: after a stall the game slows down
+# instead of running ever more ticks to catch up
+MAX_FRAME_TIME: float = 0.25
 
 
 class Game:
     def __init__(self, args: argparse.Namespace) -> None:
+        # Headless: simulation only, no window and no presentation
+        self.headless: bool = args.headless
+        self.max_ticks: Optional[int] = args.ticks
+        if self.headless:
+            os.environ["SDL_VIDEODRIVER"] = "dummy"
+            os.environ["SDL_AUDIODRIVER"] = "dummy"
+
         pygame.init()
         
-        # Display setup
-        self.is_fullscreen: bool = args.fullscreen
+        # Display setup (a display mode is still needed to convert surfaces)
+        self.is_fullscreen: bool = args.fullscreen and not self.headless
         if self.is_fullscreen:
             self.screen = pygame.display.set_mode(
                 (0, 0), pygame.FULLSCREEN
@@ -44,6 +66,12 @@ class Game:
 
         self.surface: pygame.Surface = pygame.Surface((DISPLAY_WIDTH, DISPLAY_HEIGHT))
         pygame.display.set_caption("LandStalker")
+
+        # Output scaling to the window size
+        self.scaler: Scaler = Scaler((DISPLAY_WIDTH, DISPLAY_HEIGHT), args.scaler)
+
+        # Dirty-rect presentation: only push changed screen regions
+        self.dirty_tracker: Optional[DirtyRectTracker] = DirtyRectTracker() if args.dirty_rects else None
         
         # Game state
         self.room_number: int = args.room
@@ -52,6 +80,15 @@ class Game:
         self.camera_x: float = 0
         self.camera_y: float = 0
         self.clock: pygame.time.Clock = pygame.time.Clock()
+        # Fixed-timestep loop: the simulation runs at tick_rate whatever the
+        # frame rate, rendering is capped at max_fps (0: uncapped)
+        self.tick_rate: int = args.tick_rate
+        self.tick_dt: float = 1.0 / self.tick_rate
+        self.max_fps: int = args.fps
+        self.tick_accumulator: float = 0.0
+        # Camera at the previous tick, for render interpolation
+        self.prev_camera_x: float = 0
+        self.prev_camera_y: float = 0
         self.main_scripts: dict = self.load_main_scripts("data/script.yaml")
         self.compressed_strings: list[str] = self.load_compressed_strings("data/compressed_strings.txt")
 
@@ -69,6 +106,11 @@ class Game:
         # Key state tracking for toggles
         self.prev_keys: dict = {}
         
+        # Colliding entity pairs of the current frame, only found when the
+        # broadphase statistics are shown (debug HUD or headless summary)
+        self.entity_contacts: List[Tuple[Entity, Entity]] = []
+        self.track_entity_contacts: bool = self.debug_mode or self.headless
+        
         # GUI setup
         # HUD
         self.manager: pygame_gui.UIManager = pygame_gui.UIManager((DISPLAY_WIDTH, DISPLAY_HEIGHT), "ui.json")
@@ -101,7 +143,7 @@ class Game:
         self.coord_dialog.hide()
         
         # Fade (warp) variables
-        self.fade_alpha: int = 0                # 0..255
+        self.fade_alpha: float = 0.0            # 0..255, kept fractional so slow fades still advance
         self.fade_mode: Optional[str] = None    # "out", "in", or None
         self.fade_speed: float = 400.0          # alpha units per second
         self.fade_callback: Optional[Callable[[], None]] = None
@@ -112,13 +154,10 @@ class Game:
         # Load room
         self.tiled_map: Tiledmap = Tiledmap()
         self.tiled_map.load(self.room_number)
-        room_map: str = self.tiled_map.data.properties['RoomMap']
-        
-        # Load heightmap
-        self.heightmap: Heightmap = Heightmap()
-        self.heightmap.load(room_map)
+        self.heightmap: Heightmap = self.tiled_map.heightmap
+        self.room_loader: RoomLoader = RoomLoader(self.tiled_map)
         
-        tile_h = self.tiled_map.data.tileheight
+        tile_h = self.tiled_map.tile_height
         for entity in self.tiled_map.entities:
             entity.set_world_pos(tile_h)
             entity.update_screen_pos(
@@ -137,6 +176,7 @@ class Game:
         
         # Center camera on hero initially
         self.center_camera_on_hero()
+        self.reset_interpolation()
     
     def on_entity_collids(self, entity):
         print(f"On entity collids {entity.name} {entity.behaviour}")
@@ -144,38 +184,37 @@ class Game:
 
     def fix_hero_spawn_position(self) -> None:
         """Fix hero position if spawned in invalid location"""
-        tile_h: int = self.tiled_map.data.tileheight
+        tile_h: int = self.tiled_map.tile_height
         
         # Check if hero is out of bounds
         hero_pos = self.hero.get_world_pos()
         hero_tile_x: int = int(hero_pos.x // tile_h)
         hero_tile_y: int = int(hero_pos.y // tile_h)
         
-        # If out of bounds or on unwalkable tile, find first walkable tile
+        # If out of bounds or on unwalkable tile, find the closest walkable tile
         if (hero_tile_x < 0 or hero_tile_y < 0 or
             hero_tile_x >= self.heightmap.get_width() or
             hero_tile_y >= self.heightmap.get_height() or
             not self.heightmap.get_cell(hero_tile_x, hero_tile_y) or
             not self.heightmap.get_cell(hero_tile_x, hero_tile_y).is_walkable()):
             
-            # Find first walkable tile
-            for y in range(self.heightmap.get_height()):
-                for x in range(self.heightmap.get_width()):
-                    cell: Optional[HeightmapCell] = self.heightmap.get_cell(x, y)
-                    if cell and cell.is_walkable():
-                        # Move hero to center of this tile
-                        new_x: float = x * tile_h + tile_h // 2
-                        new_y: float = y * tile_h + tile_h // 2
-                        new_z: float = cell.height * tile_h
-                        self.hero.set_world_pos(
-                            new_x, new_y, new_z,
-                            self.heightmap.left_offset,
-                            self.heightmap.top_offset,
-                            self.camera_x,
-                            self.camera_y
-                        )
-                        print(f"Hero spawned at invalid position, moved to first walkable tile: ({x}, {y})")
-                        return
+            # Find the closest walkable tile
+            nearest: Optional[Tuple[int, int]] = self.heightmap.find_nearest_walkable(hero_tile_x, hero_tile_y)
+            if nearest is not None:
+                x, y = nearest
+                # Move hero to center of this tile
+                new_x: float = x * tile_h + tile_h // 2
+                new_y: float = y * tile_h + tile_h // 2
+                new_z: float = int(self.heightmap.heights[y, x]) * tile_h
+                self.hero.set_world_pos(
+                    new_x, new_y, new_z,
+                    self.heightmap.left_offset,
+                    self.heightmap.top_offset,
+                    self.camera_x,
+                    self.camera_y
+                )
+                print(f"Hero spawned at invalid position, moved to nearest walkable tile: ({x}, {y})")
+                return
         
         # Hero is in bounds, check if Z is correct
         cell: Optional[HeightmapCell] = self.heightmap.get_cell(hero_tile_x, hero_tile_y)
@@ -227,6 +266,9 @@ class Game:
             elif event.type == pygame.VIDEORESIZE:
                 if not self.is_fullscreen:
                     self.screen = pygame.display.set_mode(event.size, pygame.RESIZABLE)
+                self.scaler.invalidate()
+                if self.dirty_tracker:
+                    self.dirty_tracker.mark_all()
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_F11:
                     # Toggle fullscreen
@@ -239,6 +281,9 @@ class Game:
                         self.screen = pygame.display.set_mode(
                             (DISPLAY_WIDTH, DISPLAY_HEIGHT)
                         )
+                    self.scaler.invalidate()
+                    if self.dirty_tracker:
+                        self.dirty_tracker.mark_all()
             
             self.manager.process_events(event)
         
@@ -253,17 +298,18 @@ class Game:
         self.camera_locked = False
         
         moved: bool = False
+        step: float = CAMERA_SPEED * self.tick_dt
         if keys[pygame.K_LEFT]:
-            self.camera_x -= CAMERA_SPEED
+            self.camera_x -= step
             moved = True
         if keys[pygame.K_RIGHT]:
-            self.camera_x += CAMERA_SPEED
+            self.camera_x += step
             moved = True
         if keys[pygame.K_UP]:
-            self.camera_y -= CAMERA_SPEED
+            self.camera_y -= step
             moved = True
         if keys[pygame.K_DOWN]:
-            self.camera_y += CAMERA_SPEED
+            self.camera_y += step
             moved = True
         
         if moved:
@@ -274,13 +320,46 @@ class Game:
                 self.camera_y
             )
     
+    def change_room(self, room_number: int, on_swap: Optional[Callable[[], None]] = None) -> None:
+        """Fade out to another room, loading it in the background during the fade-out
+
+        The new map, heightmap and entities are swapped in at once when both the
+        load and the fade-out are done; the screen stays black if the load is slower.
+        If the room fails to load, the screen fades back in on the current room.
+
+        Args:
+            room_number: Room to go to
+            on_swap: Called right after the swap (e.g. to place the hero)
+        """
+        # Prevent re-triggering while a transition is active
+        if self.fade_mode is not None or self.room_loader.is_loading():
+            return
+        self.room_loader.start(room_number)
+
+        def swap_room():
+            # On a failed load the transition is cancelled: fade back in on the current room
+            if not self.room_loader.swap():
+                return
+            self.room_number = room_number
+            self.heightmap = self.tiled_map.heightmap
+            if on_swap:
+                on_swap()
+            # Center camera on hero in new room
+            self.camera_locked = True
+            self.center_camera_on_hero()
+            # Do not blend positions across rooms
+            self.reset_interpolation()
+            self.prefetch_rooms()
+
+        self.start_fade(swap_room)
+
     def start_fade(self, callback: Callable[[], None]) -> None:
         """Begin fade-out. Callback runs at full black, then auto fade-in."""
         # Prevent re-triggering while a fade is active
         if self.fade_mode is not None:
             return
         self.fade_mode = "out"
-        self.fade_alpha = 0
+        self.fade_alpha = 0.0
         self.fade_callback = callback
         # Lock camera / input while fading
         self.camera_locked = True
@@ -292,9 +371,12 @@ class Game:
 
         change = self.fade_speed * dt
         if self.fade_mode == "out":
-            self.fade_alpha = min(255, int(self.fade_alpha + change))
+            self.fade_alpha = min(255.0, self.fade_alpha + change)
             if self.fade_alpha >= 255:
-                self.fade_alpha = 255
+                # hold the black screen until the next room is loaded
+                if self.room_loader.is_loading() and not self.room_loader.is_ready():
+                    self.fade_surface.set_alpha(int(self.fade_alpha))
+                    return
                 # run callback at full black
                 if self.fade_callback:
                     cb = self.fade_callback
@@ -304,15 +386,14 @@ class Game:
                 # start fading in
                 self.fade_mode = "in"
         elif self.fade_mode == "in":
-            self.fade_alpha = max(0, int(self.fade_alpha - change))
+            self.fade_alpha = max(0.0, self.fade_alpha - change)
             if self.fade_alpha <= 0:
-                self.fade_alpha = 0
                 self.fade_mode = None
-        self.fade_surface.set_alpha(self.fade_alpha)
+        self.fade_surface.set_alpha(int(self.fade_alpha))
     
     def check_warp_collision(self) -> bool:
         """Check if hero is colliding with any warp and handle room transition."""
-        tile_h: int = self.tiled_map.data.tileheight
+        tile_h: int = self.tiled_map.tile_height
         
         # Get hero's bounding box using helper function
         hero_x, hero_y, hero_width, hero_height = self.hero.get_bounding_box(tile_h)
@@ -329,134 +410,86 @@ class Game:
         # Update previous tile position (pre-emptively to avoid re-trigger while fading)
         self.prev_hero_tile_x = current_tile_x
         self.prev_hero_tile_y = current_tile_y
+
+        # Keep the closest warp's room first in the prefetch queue
+        self.tiled_map.prefetch_neighbours(current_tile_x, current_tile_y)
         
-        for warp in self.tiled_map.warps:
-            if warp.check_collision(hero_x, hero_y, hero_width, hero_height, tile_h, self.tiled_map.room_number, self.heightmap):
-                target_room: int = warp.get_target_room(self.room_number)
-                
-                if target_room != self.room_number:
-                    # define warp callback to execute while screen is black
-                    def do_warp():
-                        self.room_number = target_room
-                        self.tiled_map.load(self.room_number)
-
-                        room_map = self.tiled_map.data.properties['RoomMap']
-                        self.heightmap = Heightmap()
-                        self.heightmap.load(room_map)
-
-                        dest_tile_x, dest_tile_y = warp.get_destination(self.room_number, self.heightmap)
-                        dest_cell: Optional[HeightmapCell] = self.heightmap.get_cell(dest_tile_x, dest_tile_y)
-                        dest_tile_z: int = dest_cell.height if dest_cell else 0
-
-                        self.hero.set_world_pos(
-                            dest_tile_x * tile_h, dest_tile_y * tile_h, dest_tile_z * tile_h,
-                            self.heightmap.left_offset,
-                            self.heightmap.top_offset,
-                            self.camera_x,
-                            self.camera_y
-                        )
+        # Warps are indexed by tile when the room is loaded
+        warp: Optional[Warp] = self.tiled_map.get_warp_at(current_tile_x, current_tile_y)
+        if warp is not None:
+            target_room: int = warp.get_target_room(self.room_number)
+            
+            if target_room != self.room_number:
+                # place the hero once the new room is swapped in, while screen is black
+                def place_hero():
+                    dest_tile_x, dest_tile_y = warp.get_destination(self.room_number, self.heightmap)
+                    dest_cell: Optional[HeightmapCell] = self.heightmap.get_cell(dest_tile_x, dest_tile_y)
+                    dest_tile_z: int = dest_cell.height if dest_cell else 0
 
-                        # Center camera on hero in new room
-                        self.camera_locked = True
-                        self.center_camera_on_hero()
+                    self.hero.set_world_pos(
+                        dest_tile_x * tile_h, dest_tile_y * tile_h, dest_tile_z * tile_h,
+                        self.heightmap.left_offset,
+                        self.heightmap.top_offset,
+                        self.camera_x,
+                        self.camera_y
+                    )
 
-                        # Reset previous tile tracking after warp to prevent immediate re-warp
-                        self.prev_hero_tile_x = dest_tile_x
-                        self.prev_hero_tile_y = dest_tile_y
+                    # Reset previous tile tracking after warp to prevent immediate re-warp
+                    self.prev_hero_tile_x = dest_tile_x
+                    self.prev_hero_tile_y = dest_tile_y
 
-                    # start fade which will call do_warp at full-black
-                    self.start_fade(do_warp)
-                    return True
+                self.change_room(target_room, place_hero)
+                return True
         
         return False
     
+    def prefetch_rooms(self) -> None:
+        """Start loading the rooms reachable from the current room in the background"""
+        tile_h: int = self.tiled_map.tile_height
+        hero_x, hero_y, hero_width, hero_height = self.hero.get_bounding_box(tile_h)
+        self.tiled_map.prefetch_neighbours((hero_x + hero_width // 2) // tile_h,
+                                           (hero_y + hero_height // 2) // tile_h)
+
     def check_fall(self) -> bool:
         """Check if hero is falling and handle room transition"""
-        tile_h: int = self.tiled_map.data.tileheight
+        tile_h: int = self.tiled_map.tile_height
         
         if self.hero.get_world_pos().z == 0 and self.tiled_map.room_properties["WarpFallDestination"] != 65535:
             target = self.tiled_map.room_properties["WarpFallDestination"]
             print(f"falling ! {target}")
 
-            def do_fall_warp():
-                self.room_number = target
-                self.tiled_map.load(self.room_number)
-                room_map = self.tiled_map.data.properties['RoomMap']
-                self.heightmap = Heightmap()
-                self.heightmap.load(room_map)
-                self.camera_locked = True
-                self.center_camera_on_hero()
-
-            self.start_fade(do_fall_warp)
-            self.hero._world_pos.z =  self.tiled_map.data.properties['RoomZEnd'] * tile_h
+            self.change_room(target)
+            self.hero._world_pos.z =  self.tiled_map.room_properties['RoomZEnd'] * tile_h
+            self.hero.bbox.update_position(self.hero._world_pos)
 
         return False
 
     def apply_gravity(self) -> None:
-        """Apply gravity to hero using bounding box corners, considering both terrain and entities"""
-        tile_h: int = self.tiled_map.data.tileheight
+        """Apply gravity to hero using its bounding box footprint, considering both terrain and entities"""
+        tile_h: int = self.tiled_map.tile_height
         
-        # Get hero's foot height and bounding box
+        # Get hero's foot height
         hero_pos = self.hero.get_world_pos()
         height_at_foot: float = hero_pos.z
-        corners = self.hero.get_bbox_corners_world(tile_h)
-        hero_bbox = self.hero.get_bounding_box(tile_h)
-        
-        # Get tile coordinates for each corner
-        # corners are: (left, bottom, right, top)
-        left_x: int = int(corners[0][0] // tile_h)
-        left_y: int = int(corners[0][1] // tile_h)
-        bottom_x: int = int(corners[1][0] // tile_h)
-        bottom_y: int = int(corners[1][1] // tile_h)
-        right_x: int = int(corners[2][0] // tile_h)
-        right_y: int = int(corners[2][1] // tile_h)
-        top_x: int = int(corners[3][0] // tile_h)
-        top_y: int = int(corners[3][1] // tile_h)
         
         # Check if hero is above ground
         if not self.hero.is_jumping:
-            cells = self.heightmap.cells
-            
-            # Find the highest ground level under the hero (terrain)
-            max_ground_height: float = max(
-                cells[top_y][top_x].height * tile_h,
-                cells[bottom_y][bottom_x].height * tile_h,
-                cells[right_y][right_x].height * tile_h,
-                cells[left_y][left_x].height * tile_h
+            # Find the highest surface under the hero (terrain or entity, excluding grabbed entity)
+            exclude = (self.hero.grabbed_entity,) if self.hero.grabbed_entity is not None else ()
+            max_surface_height, entity_standing_on, _ = get_ground_below_hero(
+                self.hero,
+                self.tiled_map.entity_hash,
+                self.heightmap,
+                tile_h,
+                exclude
             )
-            
-            # Check for entity surfaces below the hero (excluding grabbed entity)
-            hero_x, hero_y, hero_w, hero_h = hero_bbox
-            entities_to_check = [e for e in self.tiled_map.entities 
-                               if e is not self.hero.grabbed_entity]
-            
-
-            entity_standing_on = get_entity_hero_is_standing_on(
-                                self.hero,
-                                entities_to_check,
-                                tile_h)
             if entity_standing_on is not None:
                 self.on_entity_collids(entity_standing_on)
-
-            entity_top = get_entity_top_at_position(
-                entities_to_check,
-                hero_x,
-                hero_y,
-                hero_w,
-                hero_h,
-                height_at_foot,
-                tile_h
-            )
-            
-            # Use the highest surface (terrain or entity)
-            max_surface_height: float = max_ground_height
-            if entity_top is not None:
-                max_surface_height = max(max_ground_height, entity_top)
             
             # Check if hero is above the highest surface
             if max_surface_height < height_at_foot:
                 # Hero is in the air, apply gravity
-                new_z: float = hero_pos.z - GRAVITY
+                new_z: float = hero_pos.z - GRAVITY * self.tick_dt
                 
                 # Check if gravity would push hero below surface
                 if new_z <= max_surface_height:
@@ -515,20 +548,6 @@ class Game:
                 
                 self.hero.touch_ground = True
     
-    def can_move_to(self, next_x: float, next_y: float, check_cells: List[Tuple[int, int]]) -> bool:
-        """Check if hero can move to the given position (heightmap check only)"""
-        tile_h: int = self.tiled_map.data.tileheight
-        height_at_foot: float = self.hero.get_world_pos().z
-        
-        for cell_x, cell_y in check_cells:
-            cell: Optional[HeightmapCell] = self.heightmap.get_cell(cell_x, cell_y)
-            if not cell or not cell.is_walkable():
-                return False
-            if cell.height * tile_h > height_at_foot:
-                return False
-        
-        return True
-    
     def handle_hero_movement(self, keys: pygame.key.ScancodeWrapper) -> None:
             """Handle hero movement using bounding box helpers with 3D entity collision"""
             if keys[pygame.K_LSHIFT]:  # Camera mode
@@ -552,117 +571,55 @@ class Game:
                 self.camera_locked = True
             
             hero_pos = self.hero.get_world_pos()
-            tile_h: int = self.tiled_map.data.tileheight
-            moved: bool = False
-            
-            # Get current bounding box corners
-            corners = self.hero.get_bbox_corners_world(tile_h)
-            # corners are: (left, bottom, right, top)
-            
-            new_x: float = hero_pos.x
-            new_y: float = hero_pos.y
+            tile_h: int = self.tiled_map.tile_height
             
+            # Motion vector: one axis at a time, as the facing direction
+            dx: float = 0.0
+            dy: float = 0.0
+            step: float = HERO_SPEED * self.tick_dt
             if keys[pygame.K_LEFT]:
-                next_x: float = hero_pos.x - HERO_SPEED
-                
-                # Calculate new corner positions after movement
-                new_top_x: int = int((corners[3][0] - HERO_SPEED) // tile_h)
-                new_top_y: int = int(corners[3][1] // tile_h)
-                new_left_x: int = int((corners[0][0] - HERO_SPEED) // tile_h)
-                new_left_y: int = int(corners[0][1] // tile_h)
-                
-                if next_x > 0 and self.can_move_to(next_x, hero_pos.y, [
-                    (new_top_x, new_top_y), (new_left_x, new_left_y)
-                ]):
-                    new_x = next_x
-                    moved = True
-            
+                dx = -step
             elif keys[pygame.K_RIGHT]:
-                next_x: float = hero_pos.x + HERO_SPEED
-                
-                # Calculate new corner positions after movement
-                new_right_x: int = int((corners[2][0] + HERO_SPEED) // tile_h)
-                new_right_y: int = int(corners[2][1] // tile_h)
-                new_bottom_x: int = int((corners[1][0] + HERO_SPEED) // tile_h)
-                new_bottom_y: int = int((corners[1][1] + HERO_SPEED) // tile_h)
-                
-                if new_right_x < self.heightmap.get_width() and self.can_move_to(
-                    next_x, hero_pos.y, [(new_right_x, new_right_y), (new_bottom_x, new_bottom_y)]
-                ):
-                    new_x = next_x
-                    moved = True
-            
+                dx = step
             elif keys[pygame.K_UP]:
-                next_y: float = hero_pos.y - HERO_SPEED
-                
-                # Calculate new corner positions after movement
-                new_top_x: int = int(corners[3][0] // tile_h)
-                new_top_y: int = int((corners[3][1] - HERO_SPEED) // tile_h)
-                new_right_x: int = int(corners[2][0] // tile_h)
-                new_right_y: int = int((corners[2][1] - HERO_SPEED) // tile_h)
-                
-                if next_y > 0 and self.can_move_to(hero_pos.x, next_y, [
-                    (new_top_x, new_top_y), (new_right_x, new_right_y)
-                ]):
-                    new_y = next_y
-                    moved = True
-            
+                dy = -step
             elif keys[pygame.K_DOWN]:
-                next_y: float = hero_pos.y + HERO_SPEED
-                
-                # Calculate new corner positions after movement
-                new_left_x: int = int(corners[0][0] // tile_h)
-                new_left_y: int = int((corners[0][1] + HERO_SPEED) // tile_h)
-                new_bottom_x: int = int(corners[1][0] // tile_h)
-                new_bottom_y: int = int((corners[1][1] + HERO_SPEED) // tile_h)
-                
-                if new_left_y < self.heightmap.get_height() and self.can_move_to(
-                    hero_pos.x, next_y, [(new_left_x, new_left_y), (new_bottom_x, new_bottom_y)]
-                ):
-                    new_y = next_y
-                    moved = True
+                dy = step
             
-            if moved:
-                entity = check_collids_entity(self.hero, new_x, new_y, self.tiled_map.entities, 16)
-                if entity is not None:
-                    print(f"Collids with {entity.name}")
-
-                # Resolve entity collisions in XY plane
-                # This only handles horizontal collision, not Z-axis (gravity handles that)
-                new_x, new_y, touched_entity = resolve_entity_collision(
-                    self.hero,
-                    self.tiled_map.entities,
-                    new_x,
-                    new_y,
-                    tile_h,
-                    self.heightmap.left_offset,
-                    self.heightmap.top_offset,
-                    self.camera_x,
-                    self.camera_y
-                )
-                
-                self.hero.set_world_pos(
-                    new_x, new_y, hero_pos.z,
-                    self.heightmap.left_offset,
-                    self.heightmap.top_offset,
-                    self.camera_x,
-                    self.camera_y
+            if dx or dy:
+                # Swept against terrain and entities: stops at the contact and slides along it
+                new_x, new_y, touched_entity = sweep_hero_movement(
+                    self.hero, dx, dy,
+                    self.tiled_map.entity_hash,
+                    self.heightmap,
+                    tile_h
                 )
+                if touched_entity is not None:
+                    print(f"Collids with {touched_entity.name}")
                 
-                # Update grabbed entity position if carrying something
-                if self.hero.is_grabbing:
-                    self.hero.update_grabbed_entity_position(
+                if (new_x, new_y) != (hero_pos.x, hero_pos.y):
+                    self.hero.set_world_pos(
+                        new_x, new_y, hero_pos.z,
                         self.heightmap.left_offset,
                         self.heightmap.top_offset,
                         self.camera_x,
-                        self.camera_y,
-                        tile_h
+                        self.camera_y
                     )
-                
-                if self.camera_locked:
-                    self.center_camera_on_hero()
+                    
+                    # Update grabbed entity position if carrying something
+                    if self.hero.is_grabbing:
+                        self.hero.update_grabbed_entity_position(
+                            self.heightmap.left_offset,
+                            self.heightmap.top_offset,
+                            self.camera_x,
+                            self.camera_y,
+                            tile_h
+                        )
+                    
+                    if self.camera_locked:
+                        self.center_camera_on_hero()
             
-            self.hero.update_animation(is_moving)
+            self.hero.update_animation(is_moving, self.tick_dt)
     
     def handle_jump(self, keys: pygame.key.ScancodeWrapper) -> None:
         """Handle hero jumping"""
@@ -672,8 +629,9 @@ class Game:
         if self.hero.is_jumping:
             hero_pos = self.hero.get_world_pos()
             if self.hero.current_jump < HERO_MAX_JUMP:
-                self.hero.current_jump += 2
-                new_z: float = hero_pos.z + 2
+                rise: float = HERO_JUMP_SPEED * self.tick_dt
+                self.hero.current_jump += rise
+                new_z: float = hero_pos.z + rise
                 self.hero.set_world_pos(
                     hero_pos.x, hero_pos.y, new_z,
                     self.heightmap.left_offset,
@@ -683,7 +641,7 @@ class Game:
                 )
                 
                 # Update grabbed entity position if carrying something
-                tile_h: int = self.tiled_map.data.tileheight
+                tile_h: int = self.tiled_map.tile_height
                 if self.hero.is_grabbing:
                     self.hero.update_grabbed_entity_position(
                         self.heightmap.left_offset,
@@ -701,7 +659,7 @@ class Game:
     
     def check_action(self, keys: pygame.key.ScancodeWrapper) -> None:
             """Handle action button (A key) - interact with entities or pickup/place"""
-            tile_h: int = self.tiled_map.data.tileheight
+            tile_h: int = self.tiled_map.tile_height
             
             # Check if action button (A key) was just pressed
             if not self.is_key_just_pressed(pygame.K_a, keys):
@@ -715,48 +673,43 @@ class Game:
                 # Get position in front of hero
                 place_x, place_y = get_position_in_front_of_hero(self.hero, tile_h)
                 
-                # Get ground Z at that position
                 place_tile_x = int(place_x // tile_h)
                 place_tile_y = int(place_y // tile_h)
                 
-                if (place_tile_x >= 0 and place_tile_y >= 0 and
-                    place_tile_x < self.heightmap.get_width() and
-                    place_tile_y < self.heightmap.get_height()):
+                # Cells under the entity footprint at that position
+                footprint = Heightmap.get_cell_rect(
+                    *get_entity_footprint(self.hero.grabbed_entity, place_x, place_y, tile_h), tile_h)
+                
+                if self.heightmap.is_rect_inside(*footprint):
+                    # Rest the entity on the highest cell under it
+                    place_z = self.heightmap.get_max_height_in_rect(*footprint) * tile_h
                     
-                    cell = self.heightmap.get_cell(place_tile_x, place_tile_y)
-                    if cell:
-                        place_z = cell.height * tile_h
+                    # Check if entity can be placed there
+                    if can_place_entity_at_position(
+                        self.hero.grabbed_entity,
+                        place_x,
+                        place_y,
+                        place_z,
+                        self.tiled_map.entity_hash,
+                        self.heightmap,
+                        tile_h
+                    ):
+                        # Place the entity
+                        self.hero.grabbed_entity.set_position(Vector3(place_x, place_y, place_z))
                         
-                        # Check if entity can be placed there
-                        if can_place_entity_at_position(
-                            self.hero.grabbed_entity,
-                            place_x,
-                            place_y,
-                            place_z,
-                            self.tiled_map.entities,
-                            self.heightmap,
-                            tile_h
-                        ):
-                            # Place the entity
-                            self.hero.grabbed_entity.world_pos = Vector3(place_x, place_y, place_z)
-                            if self.hero.grabbed_entity.bbox:
-                                self.hero.grabbed_entity.bbox.update_position(self.hero.grabbed_entity.world_pos)
-                            
-                            print(f"Placed entity: {self.hero.grabbed_entity.name} at ({place_tile_x}, {place_tile_y})")
-                            
-                            # Release the entity
-                            self.hero.release_entity()
-                        else:
-                            print("Cannot place entity here - position blocked")
+                        print(f"Placed entity: {self.hero.grabbed_entity.name} at ({place_tile_x}, {place_tile_y})")
+                        
+                        # Release the entity
+                        self.hero.release_entity()
                     else:
-                        print("Cannot place entity here - invalid terrain")
+                        print("Cannot place entity here - position blocked")
                 else:
                     print("Cannot place entity here - out of bounds")
 
             # Check for entity in front of hero
             entity = get_entity_in_front_of_hero(
                 self.hero,
-                self.tiled_map.entities,
+                self.tiled_map.entity_hash,
                 tile_h
             )
 
@@ -799,37 +752,29 @@ class Game:
         if not (keys[pygame.K_LCTRL] or keys[pygame.K_RCTRL]):
             return
         
-        room_changed: bool = False
-        
         if self.is_key_just_pressed(pygame.K_RIGHT, keys):
-            self.room_number += 1
-            room_changed = True
+            self.change_room(self.room_number + 1)
         elif self.is_key_just_pressed(pygame.K_LEFT, keys):
             if self.room_number > 1:
-                self.room_number -= 1
-                room_changed = True
-        
-        if room_changed:
-            self.tiled_map.load(self.room_number)
-            self.camera_locked = True
-            
-            room_map: str = self.tiled_map.data.properties['RoomMap']
-            self.heightmap = Heightmap()
-            self.heightmap.load(room_map)
-            
-            self.center_camera_on_hero()
+                self.change_room(self.room_number - 1)
     
+    def update_entity_contacts(self) -> None:
+        """Find the colliding entity pairs of this frame (sweep-and-prune broadphase, then narrowphase)"""
+        self.entity_contacts = self.tiled_map.broadphase.update()
+
     def update_hud(self) -> None:
         """Update HUD with debug information"""
         if self.debug_mode:
             hero_pos = self.hero.get_world_pos()
-            tile_h: int = self.tiled_map.data.tileheight
+            tile_h: int = self.tiled_map.tile_height
             tile_x: float = hero_pos.x // tile_h
             tile_y: float = hero_pos.y // tile_h
             tile_z: float = hero_pos.z // tile_h
             
             self.coord_label.set_text(
                 f"X: {hero_pos.x:.1f} ({tile_x:.0f}), Y: {hero_pos.y:.1f} ({tile_y:.0f}), Z: {hero_pos.z:.1f} ({tile_z:.0f})\n "
+                f"Entity pairs: {self.tiled_map.broadphase.pairs_tested} tested, "
+                f"{self.tiled_map.broadphase.pairs_found} found\n "
             )
 
     def load_compressed_strings(self, filepath: str) -> list[str]:
@@ -911,22 +856,81 @@ class Game:
         self.display_dialog = True
         self.dialog_textbox.set_text(self.compressed_strings[0])
 
-    def render(self) -> None:
-        self.surface.fill((0, 0, 0))
+    def track_dirty_regions(self, camera_x: float, camera_y: float) -> Optional[List[pygame.Rect]]:
+        """Compare this frame with the last presented one (dirty-rect mode)
+
+        Args:
+            camera_x, camera_y: Camera position of the rendered frame
+
+        Returns:
+            None if the whole frame changed, otherwise the list of changed rects
+        """
+        tracker: DirtyRectTracker = self.dirty_tracker
+
+        # Anything moving the whole picture invalidates the full frame
+        tracker.set_view((
+            camera_x, camera_y, self.room_number, int(self.fade_alpha),
+            self.is_height_map_displayed, self.is_boundbox_displayed, self.is_warps_displayed
+        ))
+
+        hero_rect = pygame.Rect(self.hero._screen_pos, self.hero.image.get_size())
+        tracker.track(self.hero, hero_rect, (
+            self.hero.current_animation, self.hero.current_frame, self.hero.facing_direction
+        ))
+
+        for entity in self.tiled_map.entities:
+            if entity.image and entity.visible and not entity.sprite_missing:
+                entity_rect = pygame.Rect(entity._screen_pos, entity.image.get_size())
+                tracker.track(entity, entity_rect, entity.image)
+
+        # HUD and dialog
+        tracker.track(self.coord_label, self.coord_label.rect, self.coord_label.text)
+        tracker.track(self.dialog_textbox, self.dialog_textbox.rect,
+                      (self.display_dialog, self.dialog_textbox.html_text))
+
+        return tracker.collect(self.surface.get_rect())
+
+    def render(self, alpha: float = 1.0) -> None:
+        """Draw the frame between the previous and the current simulation ticks
         
-        # Draw map and debug
-        self.tiled_map.draw(self.surface, self.camera_x, self.camera_y, self.hero)
-                
-        # Prepare entities for drawing (update their screen positions)
-        tile_h = self.tiled_map.data.tileheight
+        Args:
+            alpha: Blend factor, 0 for the previous tick state, 1 for the current one
+        """
+        # Interpolated camera, hero and entity screen positions
+        tile_h = self.tiled_map.tile_height
+        camera_x: float = self.camera_x
+        camera_y: float = self.camera_y
+        if alpha < 1.0:
+            camera_x = self.prev_camera_x + (self.camera_x - self.prev_camera_x) * alpha
+            camera_y = self.prev_camera_y + (self.camera_y - self.prev_camera_y) * alpha
+        self.hero.interpolate_screen_pos(
+            self.heightmap.left_offset,
+            self.heightmap.top_offset,
+            camera_x,
+            camera_y,
+            alpha
+        )
         for entity in self.tiled_map.entities:
             entity.update_screen_pos(
                 self.heightmap.left_offset,
                 self.heightmap.top_offset,
-                self.camera_x,
-                self.camera_y,
-                tile_h
+                camera_x,
+                camera_y,
+                tile_h,
+                alpha
             )
+
+        dirty_rects: Optional[List[pygame.Rect]] = None
+        if self.dirty_tracker:
+            dirty_rects = self.track_dirty_regions(camera_x, camera_y)
+            if not dirty_rects and dirty_rects is not None:
+                # Nothing changed since the last presented frame
+                return
+
+        self.surface.fill((0, 0, 0))
+        
+        # Draw map and debug
+        self.tiled_map.draw(self.surface, camera_x, camera_y)
         
         # Create a list of all drawable objects (entities + hero)
         drawable_objects = []
@@ -950,105 +954,154 @@ class Game:
         # Sort by Y+Z position (ascending order - back to front)
         drawable_objects.sort(key=lambda x: x[0])
         
-        # Draw all objects in sorted order
+        # Draw all objects in sorted order, submitted in a single call
+        draw_list = []
         for _, obj in drawable_objects:
-            obj.draw(self.surface)
+            draw_item = obj.get_draw_item()
+            if draw_item is not None:
+                draw_list.append(draw_item)
+        self.surface.fblits(draw_list)
+
+        # Priority tiles are drawn over the sprites
+        self.tiled_map.draw_priority(self.surface, camera_x, camera_y)
         
 
         if self.debug_mode:
             if self.is_height_map_displayed:
-                draw_heightmap(self.surface, self.heightmap, self.tiled_map.data.tileheight, 
-                            self.camera_x, self.camera_y)
+                draw_heightmap(self.surface, self.heightmap, self.tiled_map.tile_height, 
+                            camera_x, camera_y)
 
             if self.is_boundbox_displayed:
-                draw_hero_boundbox(self.hero, self.surface, self.tiled_map.data.tileheight, 
-                                self.camera_x, self.camera_y, self.heightmap.left_offset, 
+                draw_hero_boundbox(self.hero, self.surface, self.tiled_map.tile_height, 
+                                camera_x, camera_y, self.heightmap.left_offset, 
                                 self.heightmap.top_offset)
                 draw_entities_boundboxes(self.tiled_map.entities, self.surface, 
-                                        self.tiled_map.data.tileheight, self.camera_x, 
-                                        self.camera_y, self.heightmap.left_offset, 
+                                        self.tiled_map.tile_height, camera_x, 
+                                        camera_y, self.heightmap.left_offset, 
                                         self.heightmap.top_offset)
 
             if self.is_warps_displayed:
                 draw_warps(self.surface, self.tiled_map.warps, self.heightmap, 
-                        self.tiled_map.data.tileheight, self.camera_x, self.camera_y, 
+                        self.tiled_map.tile_height, camera_x, camera_y, 
                         self.room_number)
 
         # Draw UI on top of everything
         self.manager.draw_ui(self.surface)
 
-        # Scale with 4:3 aspect ratio
-        screen_w, screen_h = self.screen.get_size()
-        scale = min(screen_w / DISPLAY_WIDTH, screen_h / DISPLAY_HEIGHT)
-        scaled_w = int(DISPLAY_WIDTH * scale)
-        scaled_h = int(DISPLAY_HEIGHT * scale)
-        scaled_surface = pygame.transform.scale(self.surface, (scaled_w, scaled_h))
-        
-        # Center the scaled surface
-        offset_x = (screen_w - scaled_w) // 2
-        offset_y = (screen_h - scaled_h) // 2
-        self.screen.fill((0, 0, 0))
-        self.screen.blit(scaled_surface, (offset_x, offset_y))
-
-        # Draw fade overlay if active
-        if self.fade_alpha > 0:
-            scaled_fade = pygame.transform.scale(self.fade_surface, (scaled_w, scaled_h))
-            self.screen.blit(scaled_fade, (offset_x, offset_y))
-        
-        pygame.display.flip()
+        # Apply the fade before scaling, so only one surface is scaled
+        if int(self.fade_alpha) > 0:
+            self.surface.blit(self.fade_surface, (0, 0))
 
-    def run(self) -> None:
-        """Main game loop"""
-        running: bool = True
-        while running:
-            time_delta: float = self.clock.tick(FPS) / 1000.0
-            # Handle events
-            running = self.handle_events()
-            if not running:
-                break
-            # Get key states
-            keys: pygame.key.ScancodeWrapper = pygame.key.get_pressed()
-            # Exit on Escape
-            if keys[pygame.K_ESCAPE]:
-                break
-  
-            if self.display_dialog:
-                # Show dialog elements
-                self.dialog_textbox.show()
-                self.coord_dialog.show()
-                
-                # Wait for action key to dismiss dialog
-                if keys[pygame.K_a] and not self.prev_keys.get(pygame.K_a, False):
-                    self.display_dialog = False
-                    self.dialog_textbox.hide()
-                    self.coord_dialog.hide()
-            else:
-                # Hide dialog elements
+        screen_rects: Optional[List[pygame.Rect]] = self.scaler.present(self.screen, self.surface, dirty_rects)
+        if screen_rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(screen_rects)
+
+    def tick(self, keys: pygame.key.ScancodeWrapper) -> None:
+        """Advance the simulation by one fixed step (tick_dt seconds)"""
+        # Previous tick positions, blended with the new ones when rendering
+        self.hero.store_previous_pos()
+        for entity in self.tiled_map.entities:
+            entity.store_previous_pos()
+        self.prev_camera_x, self.prev_camera_y = self.camera_x, self.camera_y
+
+        if self.display_dialog:
+            # Show dialog elements
+            self.dialog_textbox.show()
+            self.coord_dialog.show()
+            
+            # Wait for action key to dismiss dialog
+            if keys[pygame.K_a] and not self.prev_keys.get(pygame.K_a, False):
+                self.display_dialog = False
                 self.dialog_textbox.hide()
                 self.coord_dialog.hide()
+        else:
+            # Hide dialog elements
+            self.dialog_textbox.hide()
+            self.coord_dialog.hide()
 
-                # Normal gameplay controls
-                self.handle_camera_movement(keys)
-                self.handle_debug_toggles(keys)
-                self.handle_room_change(keys)
-                self.apply_gravity()
-                self.handle_hero_movement(keys)
-
-                self.handle_jump(keys)
-                self.check_action(keys)
-                # warp/fall checks will now start fades; they return True if a fade initiated
-                self.check_warp_collision()  # Check for warps after movement
-                self.check_fall()
-            
-            # Update
-            self.update_hud()
-            self.manager.update(time_delta)
-            # Update fade (must be after manager.update so UI changes are visible under fade)
-            self.update_fade(time_delta)
-            # Render
-            self.render()
-            # Store current key states for next frame
-            self.prev_keys = {k: keys[k] for k in [pygame.K_d, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_a, pygame.K_F1, pygame.K_F2, pygame.K_F3]}
+            # Normal gameplay controls
+            self.handle_camera_movement(keys)
+            self.handle_debug_toggles(keys)
+            self.handle_room_change(keys)
+            self.apply_gravity()
+            self.handle_hero_movement(keys)
+
+            self.handle_jump(keys)
+            self.check_action(keys)
+            if self.track_entity_contacts:
+                self.update_entity_contacts()
+            # warp/fall checks will now start fades; they return True if a fade initiated
+            self.check_warp_collision()  # Check for warps after movement
+            self.check_fall()
+
+        self.update_fade(self.tick_dt)
+        # Store current key states for next tick
+        self.prev_keys = {k: keys[k] for k in [pygame.K_d, pygame.K_LEFT, pygame.K_RIGHT, pygame.K_a, pygame.K_F1, pygame.K_F2, pygame.K_F3]}
+
+    def reset_interpolation(self) -> None:
+        """Make the previous tick positions the current ones (after a teleport or room swap)"""
+        self.hero.store_previous_pos()
+        for entity in self.tiled_map.entities:
+            entity.store_previous_pos()
+        self.prev_camera_x, self.prev_camera_y = self.camera_x, self.camera_y
+
+    def run(self) -> None:
+        """Main game loop
         
+        Fixed timestep: the frame time is accumulated and consumed by ticks of
+        tick_dt seconds, so the simulation speed does not depend on the frame
+        rate. Each frame is rendered between the last two ticks.
+        """
+        running: bool = True
+        ticks: int = 0
+        start_time: float = time.perf_counter()
+        try:
+            while running:
+                if self.max_ticks is not None and ticks >= self.max_ticks:
+                    break
+                if self.headless:
+                    # Uncapped: run as fast as possible, one tick per iteration
+                    frame_time: float = self.tick_dt
+                else:
+                    frame_time = min(self.clock.tick(self.max_fps) / 1000.0, MAX_FRAME_TIME)
+                self.tick_accumulator += frame_time
+                # Handle events
+                running = self.handle_events()
+                if not running:
+                    break
+                # Get key states
+                keys: pygame.key.ScancodeWrapper = pygame.key.get_pressed()
+                # Exit on Escape
+                if keys[pygame.K_ESCAPE]:
+                    break
+
+                while self.tick_accumulator >= self.tick_dt:
+                    if self.max_ticks is not None and ticks >= self.max_ticks:
+                        break
+                    self.tick(keys)
+                    self.tick_accumulator -= self.tick_dt
+                    ticks += 1
+            
+                # Update
+                if not self.headless:
+                    self.update_hud()
+                self.manager.update(frame_time)
+                # Render
+                if not self.headless:
+                    self.render(min(self.tick_accumulator / self.tick_dt, 1.0))
+        except KeyboardInterrupt:
+            # Ctrl+C stops the loop like Escape, so a headless run still prints its summary
+            pass
+
+        if self.headless:
+            elapsed: float = time.perf_counter() - start_time
+            rate: float = ticks / elapsed if elapsed > 0 else 0.0
+            print(f"Simulated {ticks} ticks in {elapsed:.3f}s: {rate:.1f} ticks/s")
+            print(f"Entity pairs in room {self.room_number}: {self.tiled_map.broadphase.total_tested} tested, "
+                  f"{self.tiled_map.broadphase.total_found} found")
+
+        self.tiled_map.prefetcher.shutdown()
         pygame.quit()
-        sys.exit()
\ No newline at end of file
+        sys.exit()
@@ -1,44 +1,307 @@
 import csv
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Cells with a walkable value at or above this limit block movement
+WALKABLE_LIMIT: int = 4
+
+# Neighbour offsets (dx, dy) explored by the nearest walkable cell search
+_NEIGHBOURS: Tuple[Tuple[int, int], ...] = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+# Hex digit (ASCII code) -> value, 255 for invalid characters
+_HEX_DIGITS: np.ndarray = np.full(256, 255, dtype=np.uint8)
+for _digit in range(16):
+    _HEX_DIGITS[ord(f"{_digit:x}")] = _digit
+    _HEX_DIGITS[ord(f"{_digit:X}")] = _digit
+
+
+class RangeMaxTable:
+    """2D sparse table giving the maximum of any rectangle of an array in O(1)
+
+    levels[ky][kx][y, x] is the maximum of the 2^ky rows by 2^kx columns block
+    whose top-left cell is (x, y). Any rectangle is covered by four (overlapping)
+    such blocks. Building it takes O(n log² n) time and memory, once per map.
+    """
+
+    def __init__(self, values: np.ndarray) -> None:
+        """Build the table
+
+        Args:
+            values: 2D array indexed [y, x]
+        """
+        self.levels: List[List[np.ndarray]] = []
+        if not values.size:
+            return
+        height, width = values.shape
+
+        rows_max: np.ndarray = values
+        ky: int = 0
+        while True:
+            # Widen the 2^ky rows blocks column-wise: 1, 2, 4... columns
+            level_row: List[np.ndarray] = [rows_max]
+            block: np.ndarray = rows_max
+            kx: int = 0
+            while (2 << kx) <= width:
+                step: int = 1 << kx
+                block = np.maximum(block[:, :-step], block[:, step:])
+                level_row.append(block)
+                kx += 1
+            self.levels.append(level_row)
+
+            if (2 << ky) > height:
+                break
+            step = 1 << ky
+            rows_max = np.maximum(rows_max[:-step, :], rows_max[step:, :])
+            ky += 1
+
+    def query(self, left: int, top: int, right: int, bottom: int) -> int:
+        """Get the maximum of a rectangle (inclusive bounds, inside the array, not empty)"""
+        ky: int = (bottom - top + 1).bit_length() - 1
+        kx: int = (right - left + 1).bit_length() - 1
+        level: np.ndarray = self.levels[ky][kx]
+        bottom_start: int = bottom - (1 << ky) + 1
+        right_start: int = right - (1 << kx) + 1
+        return int(max(level[top, left], level[top, right_start],
+                       level[bottom_start, left], level[bottom_start, right_start]))
+
+    @property
+    def nbytes(self) -> int:
+        return sum(level.nbytes for level_row in self.levels for level in level_row)
 
 
 class HeightmapCell:
     def __init__(self, height: int, walkable: int) -> None:
         self.height: int = height
         self.walkable: int = walkable
-    
+
     def is_walkable(self) -> bool:
-        return self.walkable < 4
+        return self.walkable < WALKABLE_LIMIT
 
 
 class Heightmap:
     def __init__(self) -> None:
         self.left_offset: int = 0
         self.top_offset: int = 0
-        self.cells: List[List[HeightmapCell]] = []
-    
+        # Height and walkable value of each cell, indexed [y, x]
+        self.heights: np.ndarray = np.zeros((0, 0), dtype=np.uint8)
+        self.walkables: np.ndarray = np.zeros((0, 0), dtype=np.uint8)
+        # Range-max indexes over heights and walkables, built at load
+        self.height_table: RangeMaxTable = RangeMaxTable(self.heights)
+        self.walkable_table: RangeMaxTable = RangeMaxTable(self.walkables)
+        # Closest walkable cell of each cell (-1 if the map has none), built at load
+        self.nearest_x: np.ndarray = np.zeros((0, 0), dtype=np.int16)
+        self.nearest_y: np.ndarray = np.zeros((0, 0), dtype=np.int16)
+
+    @staticmethod
+    def get_filename(map_name: str) -> str:
+        return f"data/heightmaps/{map_name}_heightmap.csv"
+
     def load(self, map_name: str) -> None:
-        map_filename: str = f"data/heightmaps/{map_name}_heightmap.csv"
+        """Load the heightmap CSV: a hex offsets header, then one "WH" hex pair per cell
+
+        Args:
+            map_name: Heightmap name (RoomMap room property)
+        """
+        map_filename: str = self.get_filename(map_name)
         with open(map_filename, mode="r") as file:
             csv_reader: csv.reader = csv.reader(file)
             header: List[str] = next(csv_reader)
             self.left_offset, self.top_offset = int(header[0], 16), int(header[1], 16)
-            
-            for row in csv_reader:
-                self.cells.append([
-                    HeightmapCell(
-                        walkable=int(value[0], 16),
-                        height=int(value[1], 16)
-                    ) for value in row
-                ])
-    
+            rows: List[List[str]] = [row for row in csv_reader if row]
+
+        # Decode the walkable (1st) and height (2nd) hex digits of every cell at once
+        codes: np.ndarray = np.array(rows, dtype="S2").view(np.uint8).reshape(len(rows), -1, 2)
+        digits: np.ndarray = _HEX_DIGITS[codes]
+        if (digits == 255).any():
+            raise ValueError(f"Invalid heightmap value in {map_filename}")
+        self.walkables = digits[:, :, 0].copy()
+        self.heights = digits[:, :, 1].copy()
+        self.build_tables()
+
+    def load_arrays(self, left_offset: int, top_offset: int, width: int,
+                    heights: Sequence[int], walkables: Sequence[int]) -> None:
+        """Load the heightmap from row-major arrays (compiled rooms)
+
+        Buffers such as memoryviews are used in place, without copy.
+
+        Args:
+            left_offset, top_offset: Heightmap offsets in tiles
+            width: Number of cells per row
+            heights: Height of each cell
+            walkables: Walkable value of each cell
+        """
+        self.left_offset, self.top_offset = left_offset, top_offset
+        self.heights = np.frombuffer(heights, dtype=np.uint8).reshape(-1, width)
+        self.walkables = np.frombuffer(walkables, dtype=np.uint8).reshape(-1, width)
+        self.build_tables()
+
+    def build_tables(self) -> None:
+        """Build the range-max indexes and the nearest walkable cell map"""
+        self.height_table = RangeMaxTable(self.heights)
+        self.walkable_table = RangeMaxTable(self.walkables)
+        self.build_nearest_walkable()
+
+    def build_nearest_walkable(self) -> None:
+        """Map every cell to its closest walkable cell (4-neighbour steps)
+
+        Multi-source BFS run as a wavefront: all walkable cells are the sources,
+        each pass hands their nearest cell to the unreached neighbours of the
+        cells reached by the previous pass.
+        """
+        height, width = self.walkables.shape
+        walkable: np.ndarray = self.walkables < WALKABLE_LIMIT
+        ys, xs = np.indices((height, width), dtype=np.int16)
+        self.nearest_x = np.where(walkable, xs, -1).astype(np.int16)
+        self.nearest_y = np.where(walkable, ys, -1).astype(np.int16)
+        if not walkable.any():
+            return
+
+        reached: np.ndarray = walkable
+        while not reached.all():
+            frontier: np.ndarray = reached.copy()
+            for dx, dy in _NEIGHBOURS:
+                # Cells (x, y) not reached yet whose neighbour (x + dx, y + dy) was
+                dst = (slice(max(0, -dy), height - max(0, dy)), slice(max(0, -dx), width - max(0, dx)))
+                src = (slice(max(0, dy), height - max(0, -dy)), slice(max(0, dx), width - max(0, -dx)))
+                take: np.ndarray = reached[src] & ~frontier[dst]
+                self.nearest_x[dst][take] = self.nearest_x[src][take]
+                self.nearest_y[dst][take] = self.nearest_y[src][take]
+                frontier[dst] |= take
+            reached = frontier
+
+    def get_size_bytes(self) -> int:
+        """Get the memory used by the arrays and their indexes"""
+        return (self.heights.nbytes + self.walkables.nbytes +
+                self.height_table.nbytes + self.walkable_table.nbytes +
+                self.nearest_x.nbytes + self.nearest_y.nbytes)
+
     def get_width(self) -> int:
-        return len(self.cells[0]) if self.cells else 0
-    
+        return self.heights.shape[1]
+
     def get_height(self) -> int:
-        return len(self.cells)
-    
+        return self.heights.shape[0]
+
     def get_cell(self, x: int, y: int) -> Optional[HeightmapCell]:
-        if 0 <= y < len(self.cells) and 0 <= x < len(self.cells[0]):
-            return self.cells[y][x]
-        return None
\ No newline at end of file
+        """Get a single cell (compatibility shim, prefer the array queries)"""
+        if 0 <= y < self.heights.shape[0] and 0 <= x < self.heights.shape[1]:
+            return HeightmapCell(height=int(self.heights[y, x]), walkable=int(self.walkables[y, x]))
+        return None
+
+    def in_bounds(self, xs: Sequence[int], ys: Sequence[int]) -> np.ndarray:
+        """Check which cells are inside the heightmap
+
+        Args:
+            xs, ys: Cell coordinates
+
+        Returns:
+            Boolean array, one value per cell
+        """
+        xs = np.asarray(xs)
+        ys = np.asarray(ys)
+        return (xs >= 0) & (ys >= 0) & (xs < self.heights.shape[1]) & (ys < self.heights.shape[0])
+
+    def are_walkable(self, xs: Sequence[int], ys: Sequence[int]) -> bool:
+        """Check that every cell of a set is inside the heightmap and walkable
+
+        Args:
+            xs, ys: Cell coordinates
+
+        Returns:
+            True if all cells are walkable
+        """
+        inside: np.ndarray = self.in_bounds(xs, ys)
+        if not inside.all():
+            return False
+        return bool((self.walkables[ys, xs] < WALKABLE_LIMIT).all())
+
+    def get_max_height(self, xs: Sequence[int], ys: Sequence[int]) -> int:
+        """Get the highest cell of a set, ignoring cells outside the heightmap
+
+        Args:
+            xs, ys: Cell coordinates
+
+        Returns:
+            Highest height in tiles (0 if no cell is inside)
+        """
+        inside: np.ndarray = self.in_bounds(xs, ys)
+        if not inside.any():
+            return 0
+        return int(self.heights[np.asarray(ys)[inside], np.asarray(xs)[inside]].max())
+
+    @staticmethod
+    def get_cell_rect(x: float, y: float, width: float, height: float,
+                      tile_h: int) -> Tuple[int, int, int, int]:
+        """Get the cells covered by a world-space footprint
+
+        Args:
+            x, y: Top-left corner of the footprint in world pixels
+            width, height: Footprint size in world pixels
+            tile_h: Tile height in pixels
+
+        Returns:
+            Tuple of (left, top, right, bottom) cells, inclusive
+        """
+        return (int(x // tile_h), int(y // tile_h),
+                int((x + width) // tile_h), int((y + height) // tile_h))
+
+    def is_rect_inside(self, left: int, top: int, right: int, bottom: int) -> bool:
+        """Check that a rectangle of cells is inside the heightmap"""
+        return (left >= 0 and top >= 0 and
+                right < self.heights.shape[1] and bottom < self.heights.shape[0])
+
+    def get_max_height_in_rect(self, left: int, top: int, right: int, bottom: int) -> int:
+        """Get the highest cell of a rectangle of cells, clipped to the heightmap
+
+        Constant time whatever the rectangle size (range-max index).
+
+        Args:
+            left, top: First cell (inclusive)
+            right, bottom: Last cell (inclusive)
+
+        Returns:
+            Highest height in tiles (0 if the rectangle is outside)
+        """
+        left, top = max(0, left), max(0, top)
+        right, bottom = min(self.heights.shape[1] - 1, right), min(self.heights.shape[0] - 1, bottom)
+        if left > right or top > bottom:
+            return 0
+        return self.height_table.query(left, top, right, bottom)
+
+    def is_rect_walkable(self, left: int, top: int, right: int, bottom: int) -> bool:
+        """Check that a rectangle of cells is inside the heightmap and walkable
+
+        Constant time whatever the rectangle size (range-max index).
+
+        Args:
+            left, top: First cell (inclusive)
+            right, bottom: Last cell (inclusive)
+
+        Returns:
+            True if all cells are walkable
+        """
+        if not self.is_rect_inside(left, top, right, bottom) or left > right or top > bottom:
+            return False
+        return self.walkable_table.query(left, top, right, bottom) < WALKABLE_LIMIT
+
+    def find_nearest_walkable(self, x: int, y: int) -> Optional[Tuple[int, int]]:
+        """Get the walkable cell closest to a cell, in constant time
+
+        Cells outside the heightmap are first clamped to its edge.
+
+        Args:
+            x, y: Cell coordinates
+
+        Returns:
+            (x, y) of the closest walkable cell (the cell itself if walkable),
+            or None if no cell is walkable
+        """
+        height, width = self.heights.shape
+        if not width or not height:
+            return None
+        x = min(max(x, 0), width - 1)
+        y = min(max(y, 0), height - 1)
+        nearest_x: int = int(self.nearest_x[y, x])
+        if nearest_x < 0:
+            return None
+        return nearest_x, int(self.nearest_y[y, x])
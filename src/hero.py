@@ -2,8 +2,9 @@ import pygame
 from pygame.math import Vector2, Vector3
 from typing import Tuple, List, Optional, Dict
 from utils import cartesian_to_iso
-from boundingbox import BoundingBox, MARGIN
+from boundingbox import BoundingBox
 from entity import Entity
+from surfaceformat import SurfaceFormatStats, optimize_surface
 
 
 class Hero(pygame.sprite.Sprite):
@@ -14,7 +15,7 @@ class Hero(pygame.sprite.Sprite):
         self.animations: Dict[str, List[pygame.Surface]] = {}
         self.current_animation: str = "idle_front"
         self.current_frame: int = 0
-        self.animation_speed: float = 0.15  # Frames per game tick
+        self.animation_speed: float = 9.0  # Animation frames per second
         self.animation_timer: float = 0.0
         
         # Load all animations
@@ -24,11 +25,13 @@ class Hero(pygame.sprite.Sprite):
         self.image: pygame.Surface = self.animations[self.current_animation][0]
         
         self._world_pos: Vector3 = Vector3(x, y, z)
+        # Position at the previous simulation tick, for render interpolation
+        self._prev_world_pos: Vector3 = Vector3(x, y, z)
         self._screen_pos: Vector2 = Vector2()
         self.HEIGHT: int = 2   # height in tiles
         self.touch_ground: bool = False
         self.is_jumping: bool = False
-        self.current_jump: int = 0
+        self.current_jump: float = 0
         self.is_grabbing: bool = False
         self.grabbed_entity: Optional[Entity] = None
         self.facing_direction: str = "DOWN"  # Can be: "UP", "DOWN", "LEFT", "RIGHT"
@@ -49,8 +52,9 @@ class Hero(pygame.sprite.Sprite):
         """Load all animation spritesheets and extract frames"""
         try:
             # Idle animations (32x48 - single frame)
-            idle_back = pygame.image.load('data/sprites/SpriteGfx000Anim000.png').convert_alpha()
-            idle_front = pygame.image.load('data/sprites/SpriteGfx000Anim001.png').convert_alpha()
+            stats = SurfaceFormatStats()
+            idle_back = optimize_surface(pygame.image.load('data/sprites/SpriteGfx000Anim000.png').convert_alpha(), stats)
+            idle_front = optimize_surface(pygame.image.load('data/sprites/SpriteGfx000Anim001.png').convert_alpha(), stats)
             
             self.animations["idle_back"] = [idle_back]
             self.animations["idle_front"] = [idle_front]
@@ -59,15 +63,15 @@ class Hero(pygame.sprite.Sprite):
             walk_back_sheet = pygame.image.load('data/sprites/SpriteGfx000Anim002.png').convert_alpha()
             walk_front_sheet = pygame.image.load('data/sprites/SpriteGfx000Anim003.png').convert_alpha()
             
-            self.animations["walk_back"] = self._extract_frames(walk_back_sheet, 32, 48, 8)
-            self.animations["walk_front"] = self._extract_frames(walk_front_sheet, 32, 48, 8)
+            self.animations["walk_back"] = self._extract_frames(walk_back_sheet, 32, 48, 8, stats)
+            self.animations["walk_front"] = self._extract_frames(walk_front_sheet, 32, 48, 8, stats)
             
             # Jump animations (64x48 - 2 frames of 32x48 each)
             jump_back_sheet = pygame.image.load('data/sprites/SpriteGfx000Anim008.png').convert_alpha()
             jump_front_sheet = pygame.image.load('data/sprites/SpriteGfx000Anim009.png').convert_alpha()
             
-            self.animations["jump_back"] = self._extract_frames(jump_back_sheet, 32, 48, 2)
-            self.animations["jump_front"] = self._extract_frames(jump_front_sheet, 32, 48, 2)
+            self.animations["jump_back"] = self._extract_frames(jump_back_sheet, 32, 48, 2, stats)
+            self.animations["jump_front"] = self._extract_frames(jump_front_sheet, 32, 48, 2, stats)
             
             # For left/right, we can use back animation (or add side animations later)
             self.animations["idle_left"] = [idle_back]
@@ -76,6 +80,8 @@ class Hero(pygame.sprite.Sprite):
             self.animations["walk_right"] = self.animations["walk_front"]
             self.animations["jump_left"] = self.animations["jump_back"]
             self.animations["jump_right"] = self.animations["jump_front"]
+
+            print(f"Hero surface formats: {stats}")
             
         except (pygame.error, FileNotFoundError) as e:
             print(f"Warning: Could not load animation sprites: {e}")
@@ -96,7 +102,8 @@ class Hero(pygame.sprite.Sprite):
             self.animations["jump_right"] = [placeholder] * 2
     
     def _extract_frames(self, spritesheet: pygame.Surface, frame_width: int, 
-                       frame_height: int, num_frames: int) -> List[pygame.Surface]:
+                       frame_height: int, num_frames: int,
+                       stats: Optional[SurfaceFormatStats] = None) -> List[pygame.Surface]:
         """Extract individual frames from a spritesheet
         
         Args:
@@ -104,6 +111,7 @@ class Hero(pygame.sprite.Sprite):
             frame_width: Width of each frame
             frame_height: Height of each frame
             num_frames: Number of frames to extract
+            stats: Optional counters of the surface formats produced
             
         Returns:
             List of frame surfaces
@@ -112,14 +120,15 @@ class Hero(pygame.sprite.Sprite):
         for i in range(num_frames):
             frame = pygame.Surface((frame_width, frame_height), pygame.SRCALPHA)
             frame.blit(spritesheet, (0, 0), (i * frame_width, 0, frame_width, frame_height))
-            frames.append(frame)
+            frames.append(optimize_surface(frame, stats))
         return frames
     
-    def update_animation(self, is_moving: bool) -> None:
+    def update_animation(self, is_moving: bool, dt: float) -> None:
         """Update the current animation based on movement state and direction
         
         Args:
             is_moving: Whether the hero is currently moving
+            dt: Time step in seconds
         """
         self.is_moving = is_moving
         
@@ -166,9 +175,10 @@ class Hero(pygame.sprite.Sprite):
                 self.current_frame = 1  # Descending - second frame
         elif is_moving or len(self.animations[self.current_animation]) == 1:
             # For walk animations, use timer
-            self.animation_timer += self.animation_speed
+            self.animation_timer += self.animation_speed * dt
             if self.animation_timer >= 1.0:
-                self.animation_timer = 0.0
+                # Keep the remainder so the rate does not depend on the tick length
+                self.animation_timer -= 1.0
                 self.current_frame = (self.current_frame + 1) % len(self.animations[self.current_animation])
         
         # Update current image
@@ -213,11 +223,7 @@ class Hero(pygame.sprite.Sprite):
         Returns:
             Tuple of (x, y, width, height) in world coordinates
         """
-        x = self._world_pos.x + MARGIN
-        y = self._world_pos.y + MARGIN
-        width = tile_h - (MARGIN * 2)
-        height = tile_h - (MARGIN * 2)
-        return (x, y, width, height)
+        return self.bbox.get_bounding_box(tile_h)
     
     def get_bbox_corners_world(self, tile_h: int) -> Tuple[Tuple[float, float], ...]:
         """Get the four corners of the hero's bounding box in world coordinates
@@ -281,6 +287,7 @@ class Hero(pygame.sprite.Sprite):
         self._world_pos.x = x
         self._world_pos.y = y
         self._world_pos.z = z
+        self.bbox.update_position(self._world_pos)
         self._update_screen_pos(heightmap_left_offset, heightmap_top_offset, camera_x, camera_y)
     
     def update_camera(self, heightmap_left_offset: int, heightmap_top_offset: int, 
@@ -303,21 +310,53 @@ class Hero(pygame.sprite.Sprite):
         self._heightmap_top_offset = heightmap_top_offset
         self._camera_x = camera_x
         self._camera_y = camera_y
+        screen_x, screen_y = self._project(self._world_pos, heightmap_left_offset, heightmap_top_offset)
+        self._screen_pos.x = screen_x - camera_x
+        self._screen_pos.y = screen_y - camera_y
+    
+    def store_previous_pos(self) -> None:
+        """Remember the current position as the previous tick one (call before each simulation tick)"""
+        self._prev_world_pos.update(self._world_pos)
+    
+    def interpolate_screen_pos(self, heightmap_left_offset: int, heightmap_top_offset: int,
+                               camera_x: float, camera_y: float, alpha: float) -> None:
+        """Update screen position between the previous and the current tick positions
         
+        The projected positions are blended, not the world ones, so the hero
+        stays still relative to a camera interpolated the same way.
+        
+        Args:
+            heightmap_left_offset: Heightmap left offset
+            heightmap_top_offset: Heightmap top offset
+            camera_x: Camera X position
+            camera_y: Camera Y position
+            alpha: Blend factor, 0 for the previous tick position, 1 for the current one
+        """
+        screen_x, screen_y = self._project(self._world_pos, heightmap_left_offset, heightmap_top_offset)
+        if alpha < 1.0:
+            prev_x, prev_y = self._project(self._prev_world_pos, heightmap_left_offset, heightmap_top_offset)
+            screen_x = prev_x + (screen_x - prev_x) * alpha
+            screen_y = prev_y + (screen_y - prev_y) * alpha
+        self._screen_pos.x = screen_x - camera_x
+        self._screen_pos.y = screen_y - camera_y
+    
+    @staticmethod
+    def _project(world_pos: Vector3, heightmap_left_offset: int,
+                 heightmap_top_offset: int) -> Tuple[float, float]:
+        """Project a world position to the screen, camera not applied (private)"""
         offset_x: float = (heightmap_left_offset - 12 + 4) * 16
         offset_y: float = (heightmap_top_offset - 11 + 4) * 16
         
         iso_x: float
         iso_y: float
-        iso_x, iso_y = cartesian_to_iso(self._world_pos.x - offset_x, self._world_pos.y - offset_y)
+        iso_x, iso_y = cartesian_to_iso(world_pos.x - offset_x, world_pos.y - offset_y)
         HERO_HEIGHT: int = 32
         
-        self._screen_pos.x = iso_x - 16 - camera_x
-        self._screen_pos.y = iso_y - self._world_pos.z + 12 - camera_y + HERO_HEIGHT
+        return iso_x - 16, iso_y - world_pos.z + 12 + HERO_HEIGHT
     
-    def draw(self, surface: pygame.Surface) -> None:
-        """Draw the hero on the surface"""
-        surface.blit(self.image, self._screen_pos)
+    def get_draw_item(self) -> Optional[Tuple[pygame.Surface, Tuple[float, float]]]:
+        """Get the (image, position) pair to submit in a batched draw call"""
+        return (self.image, (self._screen_pos.x, self._screen_pos.y))
 
     def grab_entity(self, entity: Entity) -> None:
         """Start grabbing an entity
@@ -351,9 +390,5 @@ class Hero(pygame.sprite.Sprite):
         hero_pos = self.get_world_pos()
         entity_z = hero_pos.z + (self.HEIGHT * tile_h)
         
-        self.grabbed_entity.set_world_pos(tile_h)
-        self.grabbed_entity.world_pos = Vector3(hero_pos.x, hero_pos.y, entity_z)
-        
-        # Update entity's bounding box
-        if self.grabbed_entity.bbox:
-            self.grabbed_entity.bbox.update_position(self.grabbed_entity.world_pos)
\ No newline at end of file
+        # Moves the entity's bounding box too
+        self.grabbed_entity.set_position(Vector3(hero_pos.x, hero_pos.y, entity_z))
\ No newline at end of file
@@ -0,0 +1,125 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+
+class LRUCache:
+    """Least-recently-used cache bounded by entry count and/or byte budget"""
+
+    def __init__(self, max_bytes: Optional[int] = None, max_entries: Optional[int] = None) -> None:
+        """Initialize cache
+
+        Args:
+            max_bytes: Maximum total size of cached values in bytes (None for unbounded)
+            max_entries: Maximum number of cached values (None for unbounded)
+        """
+        self.max_bytes: Optional[int] = max_bytes
+        self.max_entries: Optional[int] = max_entries
+        self.total_bytes: int = 0
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+        self._entries: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self._sizes: dict = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._entries
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value and mark it as most recently used
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if not cached
+        """
+        value = self._entries.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def peek(self, key: Hashable) -> Optional[Any]:
+        """Get a cached value without touching the LRU order or the counters
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Cached value, or None if not cached
+        """
+        return self._entries.get(key)
+
+    def get_or_create(self, key: Hashable, factory: Callable[[], Any], size: int) -> Any:
+        """Get a cached value, creating and caching it on a miss
+
+        Args:
+            key: Cache key
+            factory: Called without arguments to build the value on a miss
+            size: Size in bytes of the value built by factory
+
+        Returns:
+            Cached or newly created value
+        """
+        value = self.get(key)
+        if value is None:
+            value = factory()
+            self.put(key, value, size)
+        return value
+
+    def put(self, key: Hashable, value: Any, size: int = 0) -> None:
+        """Store a value, evicting least recently used values over budget
+
+        Args:
+            key: Cache key
+            value: Value to store (must not be None)
+            size: Size of the value in bytes
+        """
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = value
+        self._sizes[key] = size
+        self.total_bytes += size
+        self._evict()
+
+    def pop(self, key: Hashable) -> Optional[Any]:
+        """Remove a value from the cache
+
+        Args:
+            key: Cache key
+
+        Returns:
+            Removed value, or None if not cached
+        """
+        if key not in self._entries:
+            return None
+        return self._remove(key)
+
+    def clear(self) -> None:
+        """Remove all values (counters are kept)"""
+        self._entries.clear()
+        self._sizes.clear()
+        self.total_bytes = 0
+
+    def _remove(self, key: Hashable) -> Any:
+        self.total_bytes -= self._sizes.pop(key)
+        return self._entries.pop(key)
+
+    def _evict(self) -> None:
+        # Always keep the most recent entry, even if it alone exceeds the budget
+        while len(self._entries) > 1 and (
+            (self.max_entries is not None and len(self._entries) > self.max_entries) or
+            (self.max_bytes is not None and self.total_bytes > self.max_bytes)
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def __repr__(self) -> str:
+        return (f"LRUCache(entries={len(self._entries)}, bytes={self.total_bytes}, "
+                f"hits={self.hits}, misses={self.misses}, evictions={self.evictions})")
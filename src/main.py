@@ -1,7 +1,25 @@
 import sys
 import argparse
 
-from game import Game
+from game import Game, TICK_RATE, FPS
+from scaler import SCALER_MODES
+
+
+def positive_int(value: str) -> int:
+    """argparse type: an integer greater than zero"""
+    number: int = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError(f"must be greater than 0, got {value}")
+    return number
+
+
+def non_negative_int(value: str) -> int:
+    """argparse type: an integer greater than or equal to zero"""
+    number: int = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"must be 0 or greater, got {value}")
+    return number
+
 
 def main() -> None:
     # Initialize argument parser
@@ -12,6 +30,12 @@ def main() -> None:
     parser.add_argument('-y', type=int, default=0, help='Hero starting Y position')
     parser.add_argument('-z', type=int, default=0, help='Hero starting Z position')
     parser.add_argument('-f', '--fullscreen', action='store_true', help='Starts fullscreen')
+    parser.add_argument('--scaler', choices=SCALER_MODES, default='nearest', help='Output scaling mode')
+    parser.add_argument('--headless', action='store_true', help='Run the simulation without a window or rendering')
+    parser.add_argument('--ticks', type=int, default=None, help='Stop after this many simulation ticks')
+    parser.add_argument('--dirty-rects', action='store_true', help='Only update changed screen regions')
+    parser.add_argument('--tick-rate', type=positive_int, default=TICK_RATE, help='Simulation ticks per second')
+    parser.add_argument('--fps', type=non_negative_int, default=FPS, help='Rendered frames per second cap (0: uncapped)')
     
     args: argparse.Namespace = parser.parse_args()
     
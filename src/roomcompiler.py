@@ -0,0 +1,168 @@
+import argparse
+import glob
+import os
+import re
+import sys
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+from typing import Any, Dict, List, Tuple
+
+from pytmx import TiledMap
+
+from heightmap import Heightmap
+from roomformat import (compiled_path, open_room, pack_block_flags, read_tmx_entities, read_tmx_layer,
+                        read_tmx_properties, read_tmx_warps, source_stamp, tmx_path, write_room)
+
+
+def find_rooms() -> List[int]:
+    """Get the numbers of every room with a TMX file"""
+    rooms: List[int] = []
+    for filename in glob.glob("data/rooms/Room*.tmx"):
+        match = re.fullmatch(r"Room(\d+)\.tmx", os.path.basename(filename))
+        if match:
+            rooms.append(int(match.group(1)))
+    return sorted(rooms)
+
+
+def find_block_sources(tmx: TiledMap, gids: set) -> Tuple[List[Dict[str, Any]], Dict[int, Tuple[int, int, int, int, int]]]:
+    """Locate the tileset image area of each block, as pytmx does when loading images
+
+    Args:
+        tmx: pytmx map loaded without images
+        gids: pytmx gids used by the tile layers
+
+    Returns:
+        Tuple of (tileset descriptors, gid -> (tileset index, x, y, width, height))
+
+    Raises:
+        ValueError: If a block uses a feature the compiled format does not support
+    """
+    tilesets: List[Dict[str, Any]] = []
+    blocks: Dict[int, Tuple[int, int, int, int, int]] = {}
+    for ts in tmx.tilesets:
+        if ts.source is None:
+            continue
+        index: int = len(tilesets)
+        tilesets.append({
+            'source': os.path.normpath(os.path.join(os.path.dirname(tmx.filename), ts.source)),
+            'trans': ts.trans,
+        })
+
+        positions = product(
+            range(ts.margin, ts.height + ts.margin - ts.tileheight + 1, ts.tileheight + ts.spacing),
+            range(ts.margin, ts.width + ts.margin - ts.tilewidth + 1, ts.tilewidth + ts.spacing),
+        )
+        for real_gid, (y, x) in enumerate(positions, ts.firstgid):
+            for gid, flags in tmx.map_gid(real_gid) or []:
+                if gid not in gids:
+                    continue
+                if flags.flipped_horizontally or flags.flipped_vertically or flags.flipped_diagonally:
+                    raise ValueError(f"gid {real_gid} uses TMX tile flipping")
+                if tmx.tile_properties.get(real_gid, {}).get("source"):
+                    raise ValueError(f"gid {real_gid} uses a per-tile image")
+                blocks[gid] = (index, x, y, ts.tilewidth, ts.tileheight)
+
+    missing: set = gids - set(blocks) - {0}
+    if missing:
+        raise ValueError(f"no tileset image for gids {sorted(missing)}")
+    return tilesets, blocks
+
+
+def compile_room(room_number: int, force: bool = False) -> str:
+    """Compile a room TMX and its heightmap CSV into a binary room file
+
+    Args:
+        room_number: Room to compile
+        force: Recompile even if the compiled file is up to date
+
+    Returns:
+        Status message
+    """
+    output: str = compiled_path(room_number)
+    if not force and open_room(output) is not None:
+        return f"Room {room_number}: up to date"
+
+    source: str = tmx_path(room_number)
+    tmx: TiledMap = TiledMap(source)
+    properties: Dict[str, Any] = read_tmx_properties(tmx)
+    sources: List[List[Any]] = [source_stamp(source)]
+    for ts in tmx.tilesets:
+        # External tilesets hold the block flip/priority properties
+        if getattr(ts, "tileset_source", None):
+            sources.append(source_stamp(os.path.normpath(os.path.join(os.path.dirname(source), ts.tileset_source))))
+
+    layers: Dict[str, Dict[str, Any]] = {}
+    arrays: Dict[str, array] = {}
+    used_gids: set = set()
+    for name in ("Background", "Foreground"):
+        width, height, offset_x, gids = read_tmx_layer(tmx, name)
+        layers[name] = {'width': width, 'height': height, 'offset_x': offset_x}
+        arrays[name] = array('I', gids)
+        used_gids.update(gids)
+
+    tilesets, block_sources = find_block_sources(tmx, used_gids)
+    block_gids: List[int] = sorted(block_sources)
+    arrays['block_gids'] = array('I', block_gids)
+    arrays['block_flags'] = array('H', [pack_block_flags(tmx.get_tile_properties_by_gid(gid) or {})
+                                        for gid in block_gids])
+    arrays['block_sources'] = array('H', [value for gid in block_gids for value in block_sources[gid]])
+
+    map_name: str = properties['RoomMap']
+    heightmap: Heightmap = Heightmap()
+    heightmap.load(map_name)
+    sources.append(source_stamp(Heightmap.get_filename(map_name)))
+    arrays['heights'] = array('B', heightmap.heights.tobytes())
+    arrays['walkables'] = array('B', heightmap.walkables.tobytes())
+
+    metadata: Dict[str, Any] = {
+        'room_number': room_number,
+        'tile_width': tmx.tilewidth,
+        'tile_height': tmx.tileheight,
+        'properties': properties,
+        'warps': read_tmx_warps(tmx),
+        'entities': read_tmx_entities(tmx),
+        'layers': layers,
+        'tilesets': tilesets,
+        'heightmap': {
+            'left_offset': heightmap.left_offset,
+            'top_offset': heightmap.top_offset,
+            'width': heightmap.get_width(),
+            'height': heightmap.get_height(),
+        },
+        'sources': sources,
+    }
+    write_room(output, metadata, arrays)
+    return f"Room {room_number}: compiled to {output} ({os.path.getsize(output)} bytes)"
+
+
+def compile_room_safe(room_number: int, force: bool) -> Tuple[bool, str]:
+    try:
+        return True, compile_room(room_number, force)
+    except Exception as e:
+        return False, f"Room {room_number}: failed ({e}), the game will load the TMX"
+
+
+def main() -> None:
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description="Compile TMX rooms and CSV heightmaps into binary room files")
+    parser.add_argument('rooms', type=int, nargs='*', help='Room numbers (default: every room in data/rooms)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='Number of worker processes (default: CPU count)')
+    parser.add_argument('-f', '--force', action='store_true', help='Recompile up-to-date rooms')
+
+    args: argparse.Namespace = parser.parse_args()
+
+    rooms: List[int] = args.rooms or find_rooms()
+    failures: int = 0
+    with ProcessPoolExecutor(max_workers=args.jobs) as executor:
+        for ok, message in executor.map(compile_room_safe, rooms, [args.force] * len(rooms)):
+            print(message)
+            if not ok:
+                failures += 1
+
+    print(f"{len(rooms) - failures}/{len(rooms)} rooms compiled or up to date")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,244 @@
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from typing import Any, Dict, List, Optional, Tuple
+
+# Compiled room file layout:
+# - header: magic, format version, metadata length (little-endian)
+# - metadata: UTF-8 JSON (properties, warps, entities, tilesets, blocks, array offsets...)
+# - arrays: raw native-endian arrays, each aligned on ARRAY_ALIGNMENT bytes,
+#   starting at the first aligned offset after the metadata
+ROOM_MAGIC: bytes = b"LSRM"
+ROOM_VERSION: int = 1
+ROOM_EXTENSION: str = ".room"
+HEADER_FORMAT: str = "<4sHI"
+HEADER_SIZE: int = struct.calcsize(HEADER_FORMAT)
+ARRAY_ALIGNMENT: int = 8
+
+# Block flag bits: one bit per quadrant (0..3) for each flag
+HFLIP_SHIFT: int = 0
+VFLIP_SHIFT: int = 4
+PRIORITY_SHIFT: int = 8
+
+
+def tmx_path(room_number: int) -> str:
+    return f"data/rooms/Room{room_number:03d}.tmx"
+
+
+def compiled_path(room_number: int) -> str:
+    return f"data/rooms/Room{room_number:03d}{ROOM_EXTENSION}"
+
+
+def pack_block_flags(properties: Dict[str, Any]) -> int:
+    """Pack the flip and priority tile properties of a block into bits
+
+    Args:
+        properties: Tile properties (isHFlipped0..3, isVFlipped0..3, hasPriority0..3)
+
+    Returns:
+        Flag bits (see HFLIP_SHIFT, VFLIP_SHIFT, PRIORITY_SHIFT)
+    """
+    flags: int = 0
+    for quadrant in range(4):
+        if properties.get(f"isHFlipped{quadrant}", False):
+            flags |= 1 << (HFLIP_SHIFT + quadrant)
+        if properties.get(f"isVFlipped{quadrant}", False):
+            flags |= 1 << (VFLIP_SHIFT + quadrant)
+        if properties.get(f"hasPriority{quadrant}", False):
+            flags |= 1 << (PRIORITY_SHIFT + quadrant)
+    return flags
+
+
+def has_block_flag(flags: int, shift: int, quadrant: int) -> bool:
+    return bool(flags & (1 << (shift + quadrant)))
+
+
+def read_tmx_properties(tmx: Any) -> Dict[str, Any]:
+    """Get the room properties of a pytmx map"""
+    properties: Dict[str, Any] = {}
+    if hasattr(tmx, "properties") and tmx.properties:
+        for key, value in tmx.properties.items():
+            properties[key] = value
+    return properties
+
+
+def read_tmx_layer(tmx: Any, name: str) -> Tuple[int, int, float, List[int]]:
+    """Get the size, horizontal offset and gids (row-major) of a pytmx tile layer
+
+    Args:
+        tmx: pytmx map
+        name: Layer name
+
+    Returns:
+        Tuple of (width, height, offset_x, gids)
+    """
+    layer = tmx.get_layer_by_name(name)
+    gids: List[int] = [gid for row in layer.data for gid in row]
+    return layer.width, layer.height, layer.offsetx, gids
+
+
+def read_tmx_warps(tmx: Any) -> List[Dict[str, Any]]:
+    """Get the warp data of a pytmx map, as expected by Warp"""
+    warps: List[Dict[str, Any]] = []
+    warp_layer = tmx.get_layer_by_name('Warps')
+    if warp_layer:
+        for warp in warp_layer:
+            warps.append({
+                'room1': int(warp.properties['room1']),
+                'room2': int(warp.properties['room2']),
+                'x': int(warp.x),
+                'y': int(warp.y),
+                'x2': int(warp.properties['x2']),
+                'y2': int(warp.properties['y2']),
+                'width': warp.width,
+                'height': warp.height,
+                'type': warp.properties['warpType']
+            })
+    return warps
+
+
+def read_tmx_entities(tmx: Any) -> List[Dict[str, Any]]:
+    """Get the entity data of a pytmx map, as expected by Entity"""
+    entities: List[Dict[str, Any]] = []
+    entity_layer = tmx.get_layer_by_name('Entities')
+    if entity_layer:
+        for entity_obj in entity_layer:
+            # Create a dictionary with all entity properties
+            entity_data: Dict[str, Any] = {
+                'name': entity_obj.name,
+            }
+
+            # Copy all properties from the TMX object
+            if hasattr(entity_obj, 'properties') and entity_obj.properties:
+                entity_data.update(entity_obj.properties)
+
+            entities.append(entity_data)
+    return entities
+
+
+def source_stamp(path: str) -> List[Any]:
+    """Get the [path, mtime_ns, size] stamp used to detect stale compiled rooms"""
+    stat: os.stat_result = os.stat(path)
+    return [path, stat.st_mtime_ns, stat.st_size]
+
+
+def write_room(path: str, metadata: Dict[str, Any], arrays: Dict[str, array]) -> None:
+    """Write a compiled room file
+
+    Args:
+        path: Output file
+        metadata: JSON serializable room data, array offsets are added to it
+        arrays: Named arrays stored raw after the metadata
+    """
+    # Array offsets are relative to the aligned end of the metadata
+    offsets: Dict[str, List[Any]] = {}
+    offset: int = 0
+    for name, values in arrays.items():
+        size: int = len(values) * values.itemsize
+        offsets[name] = [offset, size, values.typecode]
+        offset = _align(offset + size)
+    metadata_bytes: bytes = json.dumps(dict(metadata, byteorder=sys.byteorder, arrays=offsets)).encode("utf-8")
+    arrays_start: int = _align(HEADER_SIZE + len(metadata_bytes))
+
+    # Write to a temporary file first so a running game never maps a partial file
+    tmp_path: str = path + ".tmp"
+    with open(tmp_path, "wb") as file:
+        file.write(struct.pack(HEADER_FORMAT, ROOM_MAGIC, ROOM_VERSION, len(metadata_bytes)))
+        file.write(metadata_bytes)
+        for name, values in arrays.items():
+            file.seek(arrays_start + offsets[name][0])
+            values.tofile(file)
+    os.replace(tmp_path, path)
+
+
+class CompiledRoom:
+    """Memory-mapped compiled room file"""
+
+    def __init__(self, path: str, mapped: mmap.mmap, metadata: Dict[str, Any], arrays_start: int) -> None:
+        self.path: str = path
+        self.mapped: mmap.mmap = mapped
+        self.metadata: Dict[str, Any] = metadata
+        self.arrays_start: int = arrays_start
+
+    def get_array(self, name: str) -> memoryview:
+        """Get a stored array as a view on the mapped file (no copy)
+
+        Args:
+            name: Array name
+
+        Returns:
+            Read-only memoryview of the array values
+        """
+        offset, size, typecode = self.metadata["arrays"][name]
+        offset += self.arrays_start
+        return memoryview(self.mapped)[offset:offset + size].cast(typecode)
+
+
+def open_room(path: str) -> Optional[CompiledRoom]:
+    """Memory-map a compiled room file if it exists and is up to date
+
+    A compiled room is stale when one of its source files still exists and was
+    modified since compilation.
+
+    Args:
+        path: Compiled room file
+
+    Returns:
+        Mapped room, or None if the file is missing, stale or unreadable
+    """
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "rb") as file:
+            mapped: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        print(f"Warning: cannot read {path} ({e}), falling back to TMX")
+        return None
+
+    header: Optional[Tuple[Dict[str, Any], int]] = _read_header(path, mapped)
+    if header is None:
+        # Do not keep the file mapped when falling back to TMX
+        mapped.close()
+        return None
+    metadata, metadata_size = header
+    return CompiledRoom(path, mapped, metadata, _align(HEADER_SIZE + metadata_size))
+
+
+def _read_header(path: str, mapped: mmap.mmap) -> Optional[Tuple[Dict[str, Any], int]]:
+    """Read and validate the header and metadata of a mapped room file
+
+    Args:
+        path: Compiled room file, for the warnings
+        mapped: Mapped file contents
+
+    Returns:
+        Tuple of (metadata, metadata_size), or None if the room cannot be used
+    """
+    try:
+        magic, version, metadata_size = struct.unpack_from(HEADER_FORMAT, mapped, 0)
+        if magic != ROOM_MAGIC or version != ROOM_VERSION:
+            print(f"Warning: {path} has an unsupported format, falling back to TMX")
+            return None
+        metadata: Dict[str, Any] = json.loads(mapped[HEADER_SIZE:HEADER_SIZE + metadata_size])
+    except (ValueError, struct.error) as e:
+        print(f"Warning: cannot read {path} ({e}), falling back to TMX")
+        return None
+
+    if metadata.get("byteorder") != sys.byteorder:
+        print(f"Warning: {path} was compiled on a {metadata.get('byteorder')}-endian machine, falling back to TMX")
+        return None
+
+    for source, mtime_ns, size in metadata["sources"]:
+        if os.path.exists(source) and source_stamp(source) != [source, mtime_ns, size]:
+            print(f"Warning: {path} is older than {source}, falling back to TMX")
+            return None
+
+    return metadata, metadata_size
+
+
+def _align(offset: int) -> int:
+    return (offset + ARRAY_ALIGNMENT - 1) // ARRAY_ALIGNMENT * ARRAY_ALIGNMENT
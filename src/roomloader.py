@@ -0,0 +1,59 @@
+from concurrent.futures import Future
+from typing import Optional
+
+from tiledmap import Tiledmap
+
+
+class RoomLoader:
+    """Loads the next room off the main thread and swaps it in when asked
+
+    The room is parsed on the room prefetch worker (or taken from the room
+    cache) while the game keeps running, then made current in one step by swap.
+    """
+
+    def __init__(self, tiled_map: Tiledmap) -> None:
+        """Initialize room loader
+
+        Args:
+            tiled_map: Map the loaded rooms are swapped into
+        """
+        self.tiled_map: Tiledmap = tiled_map
+        self.room_number: Optional[int] = None
+        self.future: Optional[Future] = None
+
+    def start(self, room_number: int) -> None:
+        """Start loading a room in the background
+
+        Args:
+            room_number: Room to load
+        """
+        self.room_number = room_number
+        self.future = self.tiled_map.request_room(room_number)
+
+    def is_loading(self) -> bool:
+        """Check if a room was requested and not swapped in yet"""
+        return self.future is not None
+
+    def is_ready(self) -> bool:
+        """Check if the requested room finished loading"""
+        return self.future is not None and self.future.done()
+
+    def swap(self) -> bool:
+        """Make the loaded room current, waiting for it if still loading
+
+        A room that failed to load is reported and the current room is kept.
+
+        Returns:
+            True if the room was swapped in, False if it failed to load
+        """
+        future: Future = self.future
+        room_number: Optional[int] = self.room_number
+        self.future = None
+        self.room_number = None
+        try:
+            room = future.result()
+        except Exception as e:
+            print(f"Cannot change to room {room_number}: {e}")
+            return False
+        self.tiled_map.set_room(room)
+        return True
@@ -0,0 +1,99 @@
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set
+
+
+class RoomPrefetcher:
+    """Loads rooms on a background worker thread ahead of the room transitions"""
+
+    def __init__(self, load_room: Callable[[int], Any]) -> None:
+        """Initialize prefetcher
+
+        Args:
+            load_room: Called on the worker thread with a room number, parses the
+                room and stores it in the room cache
+        """
+        self.load_room: Callable[[int], Any] = load_room
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="room-prefetch")
+        self.pending: Dict[int, Future] = {}
+        # Rooms needed by a room transition, never cancelled by prefetch
+        self.requested: Set[int] = set()
+        self.lock: threading.Lock = threading.Lock()
+        self.completed: int = 0
+        self.cancelled: int = 0
+
+    def prefetch(self, room_numbers: List[int]) -> None:
+        """Queue rooms for loading, first room first
+
+        Queued rooms missing from the new list are cancelled, and the queue is
+        rebuilt in the new order behind the requested rooms. A room already being
+        parsed cannot be interrupted, it is left to finish.
+
+        Args:
+            room_numbers: Rooms to load, by decreasing priority
+        """
+        with self.lock:
+            requeue: List[int] = self._cancel_queued()
+            self.cancelled += len([room for room in requeue if room not in room_numbers])
+            for room_number in room_numbers:
+                self._submit(room_number)
+
+    def request(self, room_number: int) -> Future:
+        """Load a room ahead of every prefetched room
+
+        Requested rooms are never cancelled by prefetch.
+
+        Args:
+            room_number: Room needed next
+
+        Returns:
+            Future resolving to the value returned by load_room
+        """
+        with self.lock:
+            future: Optional[Future] = self.pending.get(room_number)
+            if future is not None and (future.running() or room_number in self.requested):
+                self.requested.add(room_number)
+                return future
+
+            # Move the room in front of the queue
+            requeue: List[int] = self._cancel_queued()
+            self.requested.add(room_number)
+            self._submit(room_number)
+            for queued in requeue:
+                self._submit(queued)
+            return self.pending[room_number]
+
+    def cancel(self) -> None:
+        """Cancel every queued prefetch (requested rooms are kept)"""
+        self.prefetch([])
+
+    def _cancel_queued(self) -> List[int]:
+        # Drop finished loads and cancel queued prefetches, keeping their order
+        cancelled: List[int] = []
+        for room_number, future in list(self.pending.items()):
+            if future.done():
+                del self.pending[room_number]
+            elif room_number not in self.requested and future.cancel():
+                del self.pending[room_number]
+                cancelled.append(room_number)
+        return cancelled
+
+    def _submit(self, room_number: int) -> None:
+        if room_number not in self.pending:
+            self.pending[room_number] = self.executor.submit(self._run, room_number)
+
+    def shutdown(self) -> None:
+        """Cancel queued loads and stop the worker thread"""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run(self, room_number: int) -> Any:
+        try:
+            room = self.load_room(room_number)
+        except Exception as e:
+            print(f"Error loading room {room_number}: {e}")
+            raise
+        finally:
+            with self.lock:
+                self.requested.discard(room_number)
+        self.completed += 1
+        return room
@@ -0,0 +1,144 @@
+import pygame
+from typing import List, Optional, Tuple
+
+# Available output scaling modes
+# - nearest: nearest neighbour, fills the window keeping the aspect ratio
+# - integer: nearest neighbour, largest whole scale factor that fits the window
+# - scale2x: scale2x pixel-art filter, then nearest neighbour to the window size
+# - smooth: bilinear filtering (smoothscale)
+SCALER_MODES: Tuple[str, ...] = ("nearest", "integer", "scale2x", "smooth")
+
+
+class Scaler:
+    """Scales the game surface to the window into a cached destination"""
+
+    def __init__(self, source_size: Tuple[int, int], mode: str = "nearest") -> None:
+        """Initialize scaler
+
+        Args:
+            source_size: Size of the game surface (width, height)
+            mode: One of SCALER_MODES
+        """
+        if mode not in SCALER_MODES:
+            raise ValueError(f"Unknown scaler mode '{mode}', expected one of {SCALER_MODES}")
+        self.mode: str = mode
+        self.source_size: Tuple[int, int] = source_size
+        self.scale: float = 1.0
+        # Whole scale factor when the output is exactly the source times it, else 0
+        self.integer_scale: int = 0
+
+        # Rebuilt when the window surface changes
+        self.screen: Optional[pygame.Surface] = None
+        self.screen_size: Optional[Tuple[int, int]] = None
+        self.dest_rect: pygame.Rect = pygame.Rect(0, 0, 0, 0)
+        self.dest: Optional[pygame.Surface] = None
+        self.scale2x_buffer: Optional[pygame.Surface] = None
+
+    def invalidate(self) -> None:
+        """Force a rebuild on the next present (e.g. after set_mode)"""
+        self.screen = None
+
+    def rebuild(self, screen: pygame.Surface, source: pygame.Surface) -> None:
+        """Compute the output rect and cache the destination for a window surface
+
+        Args:
+            screen: Window surface
+            source: Game surface
+        """
+        screen_w, screen_h = screen.get_size()
+        source_w, source_h = self.source_size
+
+        # Scale with 4:3 aspect ratio
+        self.scale = min(screen_w / source_w, screen_h / source_h)
+        if self.mode == "integer":
+            self.scale = max(1, int(self.scale))
+        scaled_w: int = min(screen_w, int(source_w * self.scale))
+        scaled_h: int = min(screen_h, int(source_h * self.scale))
+
+        # Center the scaled image, the destination is the window area itself
+        self.dest_rect = pygame.Rect((screen_w - scaled_w) // 2, (screen_h - scaled_h) // 2,
+                                     scaled_w, scaled_h)
+        self.dest = screen.subsurface(self.dest_rect)
+        factor: int = scaled_w // source_w
+        exact: bool = factor >= 1 and (scaled_w, scaled_h) == (source_w * factor, source_h * factor)
+        self.integer_scale = factor if exact else 0
+
+        self.scale2x_buffer = None
+        if self.mode == "scale2x" and (scaled_w, scaled_h) != (source_w * 2, source_h * 2):
+            self.scale2x_buffer = pygame.Surface((source_w * 2, source_h * 2), 0, source)
+
+        screen.fill((0, 0, 0))
+        self.screen = screen
+        self.screen_size = (screen_w, screen_h)
+
+    def present(self, screen: pygame.Surface, source: pygame.Surface,
+                dirty_rects: Optional[List[pygame.Rect]] = None) -> Optional[List[pygame.Rect]]:
+        """Scale the game surface onto the window
+
+        Args:
+            screen: Window surface
+            source: Game surface
+            dirty_rects: Changed areas of the game surface (None for the whole surface)
+
+        Returns:
+            Window rects to update, or None if the whole window must be flipped
+        """
+        if screen is not self.screen or screen.get_size() != self.screen_size:
+            self.rebuild(screen, source)
+            dirty_rects = None
+
+        if dirty_rects is None:
+            self.scale_into(source, self.dest)
+            return None
+
+        factor: int = self.integer_scale
+        if self.mode in ("scale2x", "smooth") or not factor:
+            # Filters read neighbouring pixels, and nearest sampling of a sub-rect
+            # at a fractional scale does not match the full frame: scale the
+            # whole frame, push only the dirty areas
+            self.scale_into(source, self.dest)
+            return [self.to_screen_rect(rect).clip(self.dest_rect) for rect in dirty_rects]
+
+        # Whole scale factor: each source pixel maps to a factor x factor block
+        screen_rects: List[pygame.Rect] = []
+        for rect in dirty_rects:
+            rect = rect.clip(source.get_rect())
+            if not rect.width or not rect.height:
+                continue
+            dest_rect = pygame.Rect(rect.x * factor, rect.y * factor, rect.width * factor, rect.height * factor)
+            pygame.transform.scale(source.subsurface(rect), dest_rect.size, self.dest.subsurface(dest_rect))
+            screen_rects.append(dest_rect.move(self.dest_rect.x, self.dest_rect.y))
+        return screen_rects
+
+    def scale_into(self, source: pygame.Surface, dest: pygame.Surface) -> None:
+        """Scale the whole game surface into the cached destination
+
+        Args:
+            source: Game surface
+            dest: Destination surface
+        """
+        if self.mode == "smooth":
+            pygame.transform.smoothscale(source, dest.get_size(), dest)
+        elif self.mode == "scale2x":
+            if self.scale2x_buffer is None:
+                pygame.transform.scale2x(source, dest)
+            else:
+                pygame.transform.scale2x(source, self.scale2x_buffer)
+                pygame.transform.scale(self.scale2x_buffer, dest.get_size(), dest)
+        else:
+            pygame.transform.scale(source, dest.get_size(), dest)
+
+    def to_screen_rect(self, rect: pygame.Rect) -> pygame.Rect:
+        """Convert a game surface rect to the window rect covering it
+
+        Args:
+            rect: Rect in game surface pixels
+
+        Returns:
+            Rect in window pixels
+        """
+        left: int = self.dest_rect.x + int(rect.left * self.scale)
+        top: int = self.dest_rect.y + int(rect.top * self.scale)
+        right: int = self.dest_rect.x + int(rect.right * self.scale + 0.999)
+        bottom: int = self.dest_rect.y + int(rect.bottom * self.scale + 0.999)
+        return pygame.Rect(left, top, right - left, bottom - top)
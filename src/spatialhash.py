@@ -0,0 +1,136 @@
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from entity import Entity
+from entityarrays import EntityArrays
+
+
+class SpatialHash:
+    """Uniform grid of tile-sized cells indexing entity bounding boxes
+
+    Each entity is stored in every cell its bounding box (margins applied)
+    touches, so a query only looks at the entities near the queried area.
+    Queries return entities in insertion order, like a scan of the entity list.
+    """
+
+    def __init__(self, tile_h: int) -> None:
+        """Initialize an empty grid
+
+        Args:
+            tile_h: Tile height in pixels, also the cell size
+        """
+        self.tile_h: int = tile_h
+        self.cells: Dict[Tuple[int, int], List[Entity]] = {}
+        # Cell range (left, top, right, bottom) and insertion index of each entity
+        self.entity_cells: Dict[Entity, Tuple[int, int, int, int]] = {}
+        self.order: Dict[Entity, int] = {}
+        # Structure-of-arrays copy of the entities, set for crowded rooms (see
+        # BATCH_MIN_CELL_ENTITIES): collision queries then run as vectorized
+        # kernels over all entities
+        self.arrays: Optional[EntityArrays] = None
+
+    def __len__(self) -> int:
+        return len(self.order)
+
+    def __contains__(self, entity: Entity) -> bool:
+        return entity in self.order
+
+    def get_max_cell_count(self) -> int:
+        """Get the number of entities of the most crowded cell"""
+        return max((len(cell) for cell in self.cells.values()), default=0)
+
+    def get_cell_range(self, x: float, y: float, width: float, height: float) -> Tuple[int, int, int, int]:
+        """Get the cells covered by a world-space rectangle
+
+        Args:
+            x, y: Top-left corner in world pixels
+            width, height: Size in world pixels
+
+        Returns:
+            Tuple of (left, top, right, bottom) cells, inclusive
+        """
+        return (int(x // self.tile_h), int(y // self.tile_h),
+                int((x + width) // self.tile_h), int((y + height) // self.tile_h))
+
+    def insert(self, entity: Entity) -> None:
+        """Add an entity at its current bounding box position
+
+        Args:
+            entity: Entity with an initialized bounding box
+        """
+        if entity in self.order:
+            self.update(entity)
+            return
+        self.order[entity] = len(self.order)
+        self._add(entity, self.get_cell_range(*entity.bbox.get_bounding_box(self.tile_h)))
+
+    def remove(self, entity: Entity) -> None:
+        """Remove an entity from the grid
+
+        Args:
+            entity: Entity to remove
+        """
+        if entity not in self.order:
+            return
+        self._discard(entity, self.entity_cells.pop(entity))
+        del self.order[entity]
+
+    def update(self, entity: Entity) -> None:
+        """Move an entity to the cells of its current bounding box
+
+        Only touches the grid when the entity changed cells.
+
+        Args:
+            entity: Entity that moved
+        """
+        if entity not in self.order:
+            return
+        cell_range = self.get_cell_range(*entity.bbox.get_bounding_box(self.tile_h))
+        old_range = self.entity_cells[entity]
+        if cell_range == old_range:
+            return
+        self._discard(entity, old_range)
+        self._add(entity, cell_range)
+
+    def query(self, x: float, y: float, width: float, height: float) -> Sequence[Entity]:
+        """Get the entities whose cells overlap a world-space rectangle
+
+        Candidates only: callers still run their exact overlap test. A query
+        inside a single cell returns the cell itself, without copy: do not
+        modify it, nor move entities while iterating over it.
+
+        Args:
+            x, y: Top-left corner in world pixels
+            width, height: Size in world pixels
+
+        Returns:
+            Entities in insertion order
+        """
+        left, top, right, bottom = self.get_cell_range(x, y, width, height)
+        if left == right and top == bottom:
+            return self.cells.get((left, top), ())
+
+        found: Dict[Entity, None] = {}
+        for cell_y in range(top, bottom + 1):
+            for cell_x in range(left, right + 1):
+                for entity in self.cells.get((cell_x, cell_y), ()):
+                    found[entity] = None
+        return sorted(found, key=self.order.__getitem__)
+
+    def _add(self, entity: Entity, cell_range: Tuple[int, int, int, int]) -> None:
+        left, top, right, bottom = cell_range
+        for cell_y in range(top, bottom + 1):
+            for cell_x in range(left, right + 1):
+                cell: List[Entity] = self.cells.setdefault((cell_x, cell_y), [])
+                cell.append(entity)
+                if len(cell) > 1:
+                    cell.sort(key=self.order.__getitem__)
+        self.entity_cells[entity] = cell_range
+
+    def _discard(self, entity: Entity, cell_range: Tuple[int, int, int, int]) -> None:
+        left, top, right, bottom = cell_range
+        for cell_y in range(top, bottom + 1):
+            for cell_x in range(left, right + 1):
+                cell: List[Entity] = self.cells[(cell_x, cell_y)]
+                cell.remove(entity)
+                if not cell:
+                    del self.cells[(cell_x, cell_y)]
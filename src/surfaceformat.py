@@ -0,0 +1,85 @@
+import pygame
+from typing import Optional
+
+# Color used as transparent key for surfaces with binary alpha
+COLORKEY: tuple = (255, 0, 255)
+
+
+class SurfaceFormatStats:
+    """Counts how many surfaces were converted to each blit format"""
+
+    def __init__(self) -> None:
+        self.opaque: int = 0
+        self.colorkey: int = 0
+        self.alpha: int = 0
+
+    def __repr__(self) -> str:
+        return f"opaque={self.opaque}, colorkey={self.colorkey}, per-pixel alpha={self.alpha}"
+
+
+def optimize_surface(surface: pygame.Surface,
+                     stats: Optional[SurfaceFormatStats] = None) -> pygame.Surface:
+    """Convert a surface to the fastest blit format its alpha channel allows
+
+    - fully opaque: plain display format (convert())
+    - no alpha channel but a colorkey: display format with the colorkey RLE accelerated
+    - alpha only 0 or 255: display format with a RLE accelerated colorkey
+    - any partial transparency: left as a per-pixel alpha surface
+
+    The display mode must be set before calling this function.
+
+    Args:
+        surface: Surface to inspect
+        stats: Optional counters updated with the chosen format
+
+    Returns:
+        Optimized surface (may be the original surface)
+    """
+    if not surface.get_flags() & pygame.SRCALPHA:
+        converted: pygame.Surface = surface.convert()
+        colorkey = surface.get_colorkey()
+        if colorkey is not None:
+            converted.set_colorkey(colorkey, pygame.RLEACCEL)
+            if stats:
+                stats.colorkey += 1
+        elif stats:
+            stats.opaque += 1
+        return converted
+
+    width, height = surface.get_size()
+    total: int = width * height
+    opaque_pixels: int = pygame.mask.from_surface(surface, 254).count()
+
+    if opaque_pixels == total:
+        if stats:
+            stats.opaque += 1
+        return surface.convert()
+
+    visible_pixels: int = pygame.mask.from_surface(surface, 0).count()
+    if visible_pixels == opaque_pixels:
+        keyed: pygame.Surface = pygame.Surface((width, height)).convert()
+        keyed.fill(COLORKEY)
+        keyed.blit(surface, (0, 0))
+        # The colorkey can only be used if no opaque pixel has the same color
+        keyed_pixels: int = pygame.mask.from_threshold(keyed, COLORKEY, (1, 1, 1, 255)).count()
+        if keyed_pixels == total - opaque_pixels:
+            keyed.set_colorkey(COLORKEY, pygame.RLEACCEL)
+            if stats:
+                stats.colorkey += 1
+            return keyed
+
+    if stats:
+        stats.alpha += 1
+    return surface
+
+
+def surface_bytes(surface: pygame.Surface) -> int:
+    """Get the size of a surface's pixel data
+
+    Args:
+        surface: Surface to measure
+
+    Returns:
+        Size in bytes
+    """
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
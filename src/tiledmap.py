@@ -1,13 +1,36 @@
+import math
+import threading
+from concurrent.futures import Future
 import pygame
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Iterator, Sequence, Set
 
 from pytmx.util_pygame import load_pygame, TiledMap
 from pygame.math import Vector2
 
-from hero import Hero
 from utils import cartesian_to_iso, iso_to_cartesian
 from warp import Warp
 from entity import Entity
+from lrucache import LRUCache
+from roomprefetch import RoomPrefetcher
+from heightmap import Heightmap
+from spatialhash import SpatialHash
+from entityarrays import BATCH_MIN_CELL_ENTITIES, EntityArrays
+from broadphase import SweepAndPrune
+from roomformat import (HFLIP_SHIFT, PRIORITY_SHIFT, VFLIP_SHIFT, CompiledRoom, compiled_path, has_block_flag,
+                        open_room, pack_block_flags, read_tmx_entities, read_tmx_layer, read_tmx_properties,
+                        read_tmx_warps, tmx_path)
+from surfaceformat import SurfaceFormatStats, optimize_surface, surface_bytes
+
+# Size in screen pixels of the square chunks the map layers are baked into
+CHUNK_SIZE: int = 128
+# Default memory budget for baked chunks (each chunk is CHUNK_SIZE² 32-bit pixels)
+CHUNK_CACHE_BUDGET: int = 8 * 1024 * 1024
+CHUNK_BYTES: int = CHUNK_SIZE * CHUNK_SIZE * 4
+# Default budgets of the parsed room cache
+ROOM_CACHE_ENTRIES: int = 8
+ROOM_CACHE_BUDGET: int = 64 * 1024 * 1024
+# Rough memory cost of the Python objects of a blockset
+BLOCKSET_BYTES: int = 400
 
 
 class Tile:
@@ -18,12 +41,6 @@ class Tile:
         self.is_vflipped: bool = False
         self.offset: Vector2 = Vector2(offset[0], offset[1])
 
-    def draw(self, surface: pygame.Surface, screen_pos: Vector2, 
-             layer_offset_h: float, camera_x: float, camera_y: float) -> None:
-        surface.blit(self.image, 
-                    (screen_pos.x - camera_x + self.offset.x + layer_offset_h, 
-                     screen_pos.y - camera_y + self.offset.y))
-
 
 class Blockset:
     def __init__(self) -> None:
@@ -32,168 +49,641 @@ class Blockset:
         self.screen_pos: Optional[Vector2] = None
         self.gid: Optional[int] = None
 
-    def draw(self, surface: pygame.Surface, layer_offset_h: float, 
-             camera_x: float, camera_y: float) -> None:
-        if self.screen_pos.x - camera_x + layer_offset_h > -16 and \
-           self.screen_pos.y - camera_y > -16 and \
-           self.screen_pos.x - camera_x + layer_offset_h < 448 and \
-           self.screen_pos.y - camera_y < 320:
-            for tile in self.tiles:
-                tile.draw(surface, self.screen_pos, layer_offset_h, camera_x, camera_y)
+    def add_to_draw_list(self, draw_list: List[Tuple[pygame.Surface, Tuple[float, float]]],
+                         layer_offset_h: float, camera_x: float, camera_y: float,
+                         priority: Optional[bool] = None) -> None:
+        x: float = self.screen_pos.x - camera_x + layer_offset_h
+        y: float = self.screen_pos.y - camera_y
+        for tile in self.tiles:
+            if priority is None or tile.has_priority == priority:
+                draw_list.append((tile.image, (x + tile.offset.x, y + tile.offset.y)))
 
 
 class Layer:
     def __init__(self) -> None:
-        self.data: Optional[TiledTileLayer] = None
+        # Layer size in blocks, horizontal offset in pixels and row-major block gids
+        self.width: int = 0
+        self.height: int = 0
+        self.offset_x: float = 0
+        self.gids: Sequence[int] = []
         self.blocksets: List[Blockset] = []
-
-    def draw(self, surface: pygame.Surface, camera_x: float, camera_y: float) -> None:
-        for blockset in self.blocksets:
-            blockset.draw(surface, self.data.offsetx, camera_x, camera_y)
-
-
-class Tiledmap:
-    def __init__(self) -> None:
-        self.data: Optional[TiledMap] = None
+        # Block size and iso grid step in pixels, set by Tiledmap.populate_layer
+        self.block_width: int = 0
+        self.block_height: int = 0
+        self.step_x: int = 0
+        self.step_y: int = 0
+
+    def visible_blocksets(self, left: float, top: float,
+                          right: float, bottom: float) -> Iterator[Blockset]:
+        """Iterate over the blocksets overlapping a screen area, in draw order
+
+        Blocksets sit on a regular iso grid: the block at grid (x, y) has its top-left
+        corner at ((x - y) * step_x + offsetx, (x + y) * step_y). The overlapping
+        area is inverted into diagonal ranges u = x - y and v = x + y, so only the
+        blocksets that can be on screen are visited.
+
+        Args:
+            left, top: Top-left corner of the area in screen pixels (camera position)
+            right, bottom: Bottom-right corner of the area in screen pixels (exclusive)
+
+        Yields:
+            Blocksets overlapping the area
+        """
+        if not self.blocksets:
+            return
+
+        offset_x: float = self.offset_x
+        u_min: int = math.floor((left - self.block_width - offset_x) / self.step_x) + 1
+        u_max: int = math.ceil((right - offset_x) / self.step_x) - 1
+        v_min: int = math.floor((top - self.block_height) / self.step_y) + 1
+        v_max: int = math.ceil(bottom / self.step_y) - 1
+
+        width: int = self.width
+        first_y: int = max(0, math.ceil((v_min - u_max) / 2))
+        last_y: int = min(self.height - 1, (v_max - u_min) // 2)
+
+        for y in range(first_y, last_y + 1):
+            first_x: int = max(0, u_min + y, v_min - y)
+            last_x: int = min(width - 1, u_max + y, v_max - y)
+            row: int = y * width
+            for x in range(first_x, last_x + 1):
+                yield self.blocksets[row + x]
+
+    def draw(self, surface: pygame.Surface, camera_x: float, camera_y: float,
+             priority: Optional[bool] = None) -> None:
+        """Draw the layer tiles visible on the surface
+
+        Args:
+            surface: Surface to draw on
+            camera_x: Camera X position
+            camera_y: Camera Y position
+            priority: Only draw tiles with this priority flag (None draws all tiles)
+        """
+        view_w, view_h = surface.get_size()
+        draw_list: List[Tuple[pygame.Surface, Tuple[float, float]]] = []
+        for blockset in self.visible_blocksets(camera_x, camera_y,
+                                               camera_x + view_w, camera_y + view_h):
+            blockset.add_to_draw_list(draw_list, self.offset_x, camera_x, camera_y, priority)
+        surface.fblits(draw_list)
+
+
+class Room:
+    """Parsed data of a room, shared by every visit while the room is cached
+
+    Everything here is read-only once loaded. Entities are mutable (crates move,
+    chests open) so only their TMX properties are kept, and fresh Entity objects
+    are built from them on each visit.
+    """
+
+    def __init__(self, room_number: int) -> None:
+        self.room_number: int = room_number
+        self.tile_width: int = 0
+        self.tile_height: int = 0
         self.background_layer: Optional[Layer] = None
         self.foreground_layer: Optional[Layer] = None
-        self.room_number: Optional[int] = None
+        self.room_properties: Dict[str, Any] = {}
         self.warps: List[Warp] = []
-        self.entities: List[Entity] = []
-
-    def load(self, room_number: int) -> None:
-        tmx_filename: str = f"data/rooms/Room{room_number:03d}.tmx"
-        print(f"loading {tmx_filename}")
-        self.data = load_pygame(tmx_filename)
+        # TMX properties of each entity, in layer order
+        self.entity_templates: List[Dict[str, Any]] = []
+        self.heightmap: Optional[Heightmap] = None
+        # Image and flip/priority flags (see roomformat) of each block gid
+        self.block_images: Dict[int, Optional[pygame.Surface]] = {}
+        self.block_flags: Dict[int, int] = {}
+        # Tileset images the block images are taken from
+        self.source_images: List[pygame.Surface] = []
+        # Memory-mapped compiled room file, when loaded from one
+        self.compiled: Optional[CompiledRoom] = None
+        # Flyweight caches of the room's tilesets: quadrant images keyed by
+        # (gid, quadrant, hflip, vflip) and the shared tile list of each gid
+        self.quadrant_cache: Dict[Tuple[int, int, bool, bool], pygame.Surface] = {}
+        self.block_tiles: Dict[int, List[Tile]] = {}
+        self.surface_stats: SurfaceFormatStats = SurfaceFormatStats()
+        # Chunks containing at least one priority tile
+        self.priority_chunks: Set[Tuple[int, int]] = set()
+        # Warp leaving the room from each tile (heightmap coordinates)
+        self.warp_tiles: Dict[Tuple[int, int], Warp] = {}
+        # Approximate memory used by the room, set by load
+        self.size_bytes: int = 0
+
+    def load(self) -> None:
+        """Load the room from its compiled file, or parse its TMX file and heightmap CSV
+
+        The compiled file (see roomcompiler) is used when it exists and is newer
+        than its sources.
+        """
+        compiled: Optional[CompiledRoom] = open_room(compiled_path(self.room_number))
+        if compiled is not None:
+            print(f"loading {compiled.path}")
+            self.load_compiled(compiled)
+        else:
+            self.load_tmx(tmx_path(self.room_number))
 
-        self.background_layer = Layer()
-        self.background_layer.data = self.data.get_layer_by_name("Background")
         self.populate_layer(self.background_layer)
-        
-        self.foreground_layer = Layer()
-        self.foreground_layer.data = self.data.get_layer_by_name("Foreground")
         self.populate_layer(self.foreground_layer)
-        
-        self.room_number = room_number
-
-        self.room_properties: Dict[str, Any] = {}
-        if hasattr(self.data, "properties") and self.data.properties:
-            for key, value in self.data.properties.items():
-                self.room_properties[key] = value
+        print(f"Tile surface formats: {self.surface_stats}")
+        self.priority_chunks = self.find_priority_chunks()
+        self.warp_tiles = self.find_warp_tiles()
 
         print("Room properties loaded:")
         for k, v in self.room_properties.items():
             print(f"  {k}: {v}")
 
-        # Load warps as Warp objects
-        self.warps = []
-        warp_layer = self.data.get_layer_by_name('Warps')
-        if warp_layer:
-            for warp in warp_layer:
-                warp_data: Dict[str, Any] = {
-                    'room1': int(warp.properties['room1']),
-                    'room2': int(warp.properties['room2']),
-                    'x': int(warp.x),
-                    'y': int(warp.y),
-                    'x2': int(warp.properties['x2']),
-                    'y2': int(warp.properties['y2']),
-                    'width': warp.width,
-                    'height': warp.height,
-                    'type': warp.properties['warpType']
-                }
-                self.warps.append(Warp(warp_data))
-        
-        # Load entities
-        self.entities = []
-        entity_layer = self.data.get_layer_by_name('Entities')
-        if entity_layer:
-            for entity_obj in entity_layer:
-                # Create a dictionary with all entity properties
-                entity_data: Dict[str, Any] = {
-                    'name': entity_obj.name,
-                }
-                
-                # Copy all properties from the TMX object
-                if hasattr(entity_obj, 'properties') and entity_obj.properties:
-                    entity_data.update(entity_obj.properties)
-                
-                # Create Entity object
-                entity = Entity(entity_data)
-                
-
-                entity.x -= 12  # hardcoded offsets
-                entity.y -= 12
-
-                # Calculate world position
-                entity.set_world_pos(self.data.tileheight)
-                
-                self.entities.append(entity)
-            
-            print(f"Loaded {len(self.entities)} entities:")
-            for entity in self.entities:
-                print(f"  - {entity}")
+        self.size_bytes = self.estimate_size()
+
+    def load_tmx(self, tmx_filename: str) -> None:
+        """Parse the room from a TMX file and its heightmap CSV
 
-    def draw(self, surface: pygame.Surface, camera_x: float, camera_y: float, hero: Hero) -> None:
-        self.background_layer.draw(surface, camera_x, camera_y)
+        Args:
+            tmx_filename: TMX file
+        """
+        print(f"loading {tmx_filename}")
+        data: TiledMap = load_pygame(tmx_filename)
+        self.tile_width = data.tilewidth
+        self.tile_height = data.tileheight
+        self.room_properties = read_tmx_properties(data)
 
-        for blockset in self.foreground_layer.blocksets:
-            for tile in blockset.tiles:
-                if tile.has_priority == False:
-                    tile.draw(surface, blockset.screen_pos, self.foreground_layer.data.offsetx, camera_x, camera_y)
+        self.background_layer = Layer()
+        self.foreground_layer = Layer()
+        for layer, name in ((self.background_layer, "Background"), (self.foreground_layer, "Foreground")):
+            layer.width, layer.height, layer.offset_x, layer.gids = read_tmx_layer(data, name)
+            for gid in layer.gids:
+                if gid not in self.block_images:
+                    self.block_images[gid] = data.get_tile_image_by_gid(gid)
+                    self.block_flags[gid] = pack_block_flags(data.get_tile_properties_by_gid(gid) or {})
+        self.source_images = [image for image in data.images if image is not None]
 
-        #hero.draw(surface)
+        # Load warps as Warp objects
+        self.warps = [Warp(warp_data) for warp_data in read_tmx_warps(data)]
+        # Load entity properties
+        self.entity_templates = read_tmx_entities(data)
+
+        # Load heightmap
+        self.heightmap = Heightmap()
+        self.heightmap.load(self.room_properties['RoomMap'])
+
+    def load_compiled(self, compiled: CompiledRoom) -> None:
+        """Load the room from a memory-mapped compiled room file
+
+        Args:
+            compiled: Mapped room file
+        """
+        metadata: Dict[str, Any] = compiled.metadata
+        self.compiled = compiled
+        self.tile_width = metadata['tile_width']
+        self.tile_height = metadata['tile_height']
+        self.room_properties = dict(metadata['properties'])
+
+        self.background_layer = Layer()
+        self.foreground_layer = Layer()
+        for layer, name in ((self.background_layer, "Background"), (self.foreground_layer, "Foreground")):
+            layer_data: Dict[str, Any] = metadata['layers'][name]
+            layer.width = layer_data['width']
+            layer.height = layer_data['height']
+            layer.offset_x = layer_data['offset_x']
+            layer.gids = compiled.get_array(name)
+
+        # Load tileset images, converted like pytmx does for TMX files
+        for tileset in metadata['tilesets']:
+            image: pygame.Surface = pygame.image.load(tileset['source'])
+            if tileset['trans']:
+                image = image.convert()
+                image.set_colorkey(pygame.Color(f"#{tileset['trans']}"))
+            self.source_images.append(image.convert_alpha())
+
+        block_sources: memoryview = compiled.get_array('block_sources')
+        for index, (gid, flags) in enumerate(zip(compiled.get_array('block_gids'),
+                                                 compiled.get_array('block_flags'))):
+            tileset, x, y, width, height = block_sources[index * 5:index * 5 + 5]
+            self.block_images[gid] = self.source_images[tileset].subsurface((x, y, width, height))
+            self.block_flags[gid] = flags
+
+        self.warps = [Warp(warp_data) for warp_data in metadata['warps']]
+        self.entity_templates = metadata['entities']
+
+        heightmap_data: Dict[str, Any] = metadata['heightmap']
+        self.heightmap = Heightmap()
+        self.heightmap.load_arrays(heightmap_data['left_offset'], heightmap_data['top_offset'],
+                                   heightmap_data['width'],
+                                   compiled.get_array('heights'), compiled.get_array('walkables'))
+
+    def create_entities(self) -> List[Entity]:
+        """Build fresh entities from the room's entity properties
+
+        Returns:
+            New Entity objects, in layer order
+        """
+        entities: List[Entity] = []
+        for entity_data in self.entity_templates:
+            # Create Entity object
+            entity = Entity(dict(entity_data))
+
+            entity.x -= 12  # hardcoded offsets
+            entity.y -= 12
+
+            # Calculate world position
+            entity.set_world_pos(self.tile_height)
+            
+            entities.append(entity)
         
-        for blockset in self.background_layer.blocksets:
-            for tile in blockset.tiles:
-                if tile.has_priority == True:
-                    tile.draw(surface, blockset.screen_pos, self.background_layer.data.offsetx, camera_x, camera_y)
+        print(f"Loaded {len(entities)} entities:")
+        for entity in entities:
+            print(f"  - {entity}")
+        return entities
+
+    def estimate_size(self) -> int:
+        """Estimate the memory used by the room
+
+        Counts the pixels of the tileset images and quadrant tiles, the heightmap
+        arrays, plus a rough per-object cost for blocksets.
+
+        Returns:
+            Approximate size in bytes
+        """
+        size: int = 0
+        for image in self.source_images:
+            size += surface_bytes(image)
+        for image in self.quadrant_cache.values():
+            size += surface_bytes(image)
+        size += BLOCKSET_BYTES * (len(self.background_layer.blocksets) +
+                                  len(self.foreground_layer.blocksets))
+        size += self.heightmap.get_size_bytes()
+        return size
+
+    def find_priority_chunks(self) -> Set[Tuple[int, int]]:
+        """Find the chunks overlapped by at least one priority tile
+
+        Returns:
+            Set of (chunk_x, chunk_y)
+        """
+        chunks: Set[Tuple[int, int]] = set()
+        for layer in (self.background_layer, self.foreground_layer):
+            for blockset in layer.blocksets:
+                for tile in blockset.tiles:
+                    if not tile.has_priority:
+                        continue
+                    left: int = math.floor(blockset.screen_pos.x + layer.offset_x + tile.offset.x)
+                    top: int = math.floor(blockset.screen_pos.y + tile.offset.y)
+                    right: int = left + tile.image.get_width() - 1
+                    bottom: int = top + tile.image.get_height() - 1
+                    for chunk_y in range(top // CHUNK_SIZE, bottom // CHUNK_SIZE + 1):
+                        for chunk_x in range(left // CHUNK_SIZE, right // CHUNK_SIZE + 1):
+                            chunks.add((chunk_x, chunk_y))
+        return chunks
+
+    def find_warp_tiles(self) -> Dict[Tuple[int, int], Warp]:
+        """Index the warps leaving the room by the tiles they cover
+
+        Where warps overlap, the first one in room order wins, as when the
+        warps are checked in turn. Warps back to this room never trigger and
+        are left out.
+
+        Returns:
+            Dict of (tile_x, tile_y) in heightmap coordinates -> Warp
+        """
+        warp_tiles: Dict[Tuple[int, int], Warp] = {}
+        for warp in self.warps:
+            if warp.get_target_room(self.room_number) == self.room_number:
+                continue
+            left, top, width, height = warp.get_tile_rect(self.room_number)
+            # Sizes may be fractional (TMX objects): a tile is inside if it starts in the zone
+            for tile_y in range(top, math.ceil(top + height)):
+                for tile_x in range(left, math.ceil(left + width)):
+                    warp_tiles.setdefault((tile_x, tile_y), warp)
+        return warp_tiles
+
+    def get_block_tiles(self, gid: int) -> List[Tile]:
+        """Get the four quadrant tiles of a block, shared by every cell using this gid
+
+        Args:
+            gid: Global tile id of the block
+
+        Returns:
+            List of the top-left, top-right, bottom-left and bottom-right tiles
+        """
+        tiles: Optional[List[Tile]] = self.block_tiles.get(gid)
+        if tiles is not None:
+            return tiles
+
+        # Get the tile image and dimensions
+        tile_image: pygame.Surface = self.block_images[gid]
+        half_width: int = tile_image.get_width() // 2
+        half_height: int = tile_image.get_height() // 2
+
+        # Define offsets for the tiles inside a block
+        offsets: List[Tuple[int, int]] = [(0, 0), (half_width, 0), (0, half_height), (half_width, half_height)]
+
+        # Access the tile flip and priority flags
+        flags: int = self.block_flags[gid]
+
+        tiles = []
+        for index, offset in enumerate(offsets):
+            tile: Tile = Tile(offset)
+            tile.is_hflipped = has_block_flag(flags, HFLIP_SHIFT, index)
+            tile.is_vflipped = has_block_flag(flags, VFLIP_SHIFT, index)
+            tile.has_priority = has_block_flag(flags, PRIORITY_SHIFT, index)
+
+            key: Tuple[int, int, bool, bool] = (gid, index, tile.is_hflipped, tile.is_vflipped)
+            tile.image = self.quadrant_cache.get(key)
+            if tile.image is None:
+                tile.image = tile_image.subsurface(pygame.Rect(offset, (half_width, half_height)))
+                if tile.is_hflipped or tile.is_vflipped:
+                    tile.image = pygame.transform.flip(tile.image, tile.is_hflipped, tile.is_vflipped)
+                tile.image = optimize_surface(tile.image, self.surface_stats)
+                self.quadrant_cache[key] = tile.image
+
+            tiles.append(tile)
+
+        self.block_tiles[gid] = tiles
+        return tiles
 
     def populate_layer(self, layer: Layer) -> None:
-        for y in range(layer.data.height):
-            for x in range(layer.data.width):
-                gid: int = layer.data.data[y][x]
-
-                # Get the tile image
-                tile_image: pygame.Surface = self.data.get_tile_image_by_gid(gid)
-                
-                # Get the tile dimensions
-                tile_width: int
-                tile_height: int
-                tile_width, tile_height = tile_image.get_width(), tile_image.get_height()
-
-                # Define sub-rects for each quadrant of the tile
-                top_left_rect: pygame.Rect = pygame.Rect(0, 0, tile_width // 2, tile_height // 2)
-                top_right_rect: pygame.Rect = pygame.Rect(tile_width // 2, 0, tile_width // 2, tile_height // 2)
-                bottom_left_rect: pygame.Rect = pygame.Rect(0, tile_height // 2, tile_width // 2, tile_height // 2)
-                bottom_right_rect: pygame.Rect = pygame.Rect(tile_width // 2, tile_height // 2, tile_width // 2, tile_height // 2)
-
-                # Define offsets for the tiles inside a block
-                offsets: List[Tuple[int, int]] = [(0, 0), (tile_width // 2, 0), (0, tile_height // 2), (tile_width // 2, tile_height // 2)]
-                tiles_rect: List[pygame.Rect] = [top_left_rect, top_right_rect, bottom_left_rect, bottom_right_rect]
+        layer.block_width = self.tile_width
+        layer.block_height = self.tile_height
+        layer.step_x = self.tile_width // 2
+        layer.step_y = self.tile_height // 2
+
+        for y in range(layer.height):
+            for x in range(layer.width):
+                gid: int = layer.gids[y * layer.width + x]
 
                 # Calculate screen position of the block
                 screen_x: float
                 screen_y: float
                 screen_x, screen_y = iso_to_cartesian(x, y)
-                screen_x *= self.data.tilewidth // 2
-                screen_y *= self.data.tileheight // 2
+                screen_x *= layer.step_x
+                screen_y *= layer.step_y
 
                 # instanciate a new blockset
                 blockset: Blockset = Blockset()
                 blockset.grid_pos = Vector2(x, y)
                 blockset.screen_pos = Vector2(screen_x, screen_y)
                 blockset.gid = gid
+                blockset.tiles = self.get_block_tiles(gid)
 
-                # Access the tile properties
-                tile_properties: Optional[Dict[str, Any]] = self.data.get_tile_properties_by_gid(gid)
+                layer.blocksets.append(blockset)
 
-                for index, (sub_tile, offset) in enumerate(zip(tiles_rect, offsets)):
-                    tile: Tile = Tile(offset)
-                    tile.image = tile_image.subsurface(sub_tile)
 
-                    # tile.is_hflipped = tile_properties.get(f"isHFlipped{index}", False)
-                    # tile.is_vflipped = tile_properties.get(f"isVFlipped{index}", False)
-                    # tile.has_priority = tile_properties.get(f"hasPriority{index}", False)
+class Tiledmap:
+    def __init__(self, chunk_cache_budget: int = CHUNK_CACHE_BUDGET,
+                 room_cache_entries: Optional[int] = ROOM_CACHE_ENTRIES,
+                 room_cache_budget: Optional[int] = ROOM_CACHE_BUDGET) -> None:
+        """Initialize tiled map
+
+        Args:
+            chunk_cache_budget: Memory budget in bytes for pre-rendered map chunks
+            room_cache_entries: Maximum number of parsed rooms kept in memory (None for unbounded)
+            room_cache_budget: Memory budget in bytes for parsed rooms (None for unbounded)
+        """
+        self.room: Optional[Room] = None
+        self.tile_width: int = 0
+        self.tile_height: int = 0
+        self.background_layer: Optional[Layer] = None
+        self.foreground_layer: Optional[Layer] = None
+        self.room_number: Optional[int] = None
+        self.room_properties: Dict[str, Any] = {}
+        self.warps: List[Warp] = []
+        # Warp leaving the room from each tile, see Room.find_warp_tiles
+        self.warp_tiles: Dict[Tuple[int, int], Warp] = {}
+        self.entities: List[Entity] = []
+        # Entities by tile-sized cell, for collision queries
+        self.entity_hash: Optional[SpatialHash] = None
+        # Entity-vs-entity contacts broadphase
+        self.broadphase: Optional[SweepAndPrune] = None
+        self.heightmap: Optional[Heightmap] = None
+        self.room_cache: LRUCache = LRUCache(max_bytes=room_cache_budget, max_entries=room_cache_entries)
+        # The room cache is shared with the prefetch worker thread
+        self.room_cache_lock: threading.Lock = threading.Lock()
+        self.prefetcher: RoomPrefetcher = RoomPrefetcher(self.cache_room)
+        self.chunk_cache: LRUCache = LRUCache(max_bytes=chunk_cache_budget)
+        # Map image of the previous frame and the view origin it was drawn at
+        self.map_surface: Optional[pygame.Surface] = None
+        self.map_view: Optional[Tuple[int, int]] = None
+        # Chunks containing at least one priority tile
+        self.priority_chunks: Set[Tuple[int, int]] = set()
 
-                    blockset.tiles.append(tile)
-                layer.blocksets.append(blockset)
\ No newline at end of file
+    def load(self, room_number: int) -> None:
+        """Load a room and make it current, blocking until it is parsed
+
+        Args:
+            room_number: Room to load
+        """
+        self.set_room(self.request_room(room_number).result())
+
+    def request_room(self, room_number: int) -> Future:
+        """Get a room from the room cache, or start parsing it on the worker thread
+
+        A room already being prefetched is not parsed a second time.
+
+        Args:
+            room_number: Room needed next
+
+        Returns:
+            Future resolving to the Room
+        """
+        with self.room_cache_lock:
+            room: Optional[Room] = self.room_cache.get(room_number)
+        if room is not None:
+            future: Future = Future()
+            future.set_result(room)
+            return future
+        return self.prefetcher.request(room_number)
+
+    def set_room(self, room: Room) -> None:
+        """Make a parsed room current: map, heightmap and fresh entities at once
+
+        Args:
+            room: Room to switch to
+        """
+        print(f"Room {room.room_number}: {self.room_cache}")
+        self.room = room
+        self.room_number = room.room_number
+        self.tile_width = room.tile_width
+        self.tile_height = room.tile_height
+        self.background_layer = room.background_layer
+        self.foreground_layer = room.foreground_layer
+        self.room_properties = room.room_properties
+        self.warps = room.warps
+        self.warp_tiles = room.warp_tiles
+        self.heightmap = room.heightmap
+        self.priority_chunks = room.priority_chunks
+        self.entities = room.create_entities()
+        self.entity_hash = SpatialHash(self.tile_height)
+        for entity in self.entities:
+            self.entity_hash.insert(entity)
+            entity.move_listeners.append(self.entity_hash.update)
+        self.broadphase = SweepAndPrune(self.entities, self.tile_height)
+        for entity in self.entities:
+            entity.move_listeners.append(self.broadphase.mark_moved)
+        if self.entity_hash.get_max_cell_count() >= BATCH_MIN_CELL_ENTITIES:
+            self.entity_hash.arrays = EntityArrays(self.entities, self.tile_height)
+            for entity in self.entities:
+                entity.move_listeners.append(self.entity_hash.arrays.update)
+
+        self.chunk_cache.clear()
+        self.map_view = None
+
+    def get_warp_at(self, tile_x: int, tile_y: int) -> Optional[Warp]:
+        """Get the warp leaving the current room from a tile, in constant time
+
+        Args:
+            tile_x, tile_y: Tile position (heightmap coordinates)
+
+        Returns:
+            Warp covering the tile, or None
+        """
+        return self.warp_tiles.get((tile_x, tile_y))
+
+    def cache_room(self, room_number: int) -> Room:
+        """Parse a room into the room cache unless it is already cached
+
+        Safe to call from the prefetch worker thread.
+
+        Args:
+            room_number: Room to parse
+
+        Returns:
+            Cached room
+        """
+        with self.room_cache_lock:
+            if room_number in self.room_cache:
+                return self.room_cache.peek(room_number)
+        room: Room = Room(room_number)
+        room.load()
+        with self.room_cache_lock:
+            self.room_cache.put(room_number, room, room.size_bytes)
+        return room
+
+    def prefetch_neighbours(self, tile_x: float, tile_y: float) -> None:
+        """Prefetch the rooms reachable from the current room in the background
+
+        Warp destinations are queued from the warp closest to the hero, then the
+        fall destination. Queued rooms no longer reachable are cancelled.
+
+        Args:
+            tile_x, tile_y: Hero tile position (heightmap coordinates)
+        """
+        targets: List[int] = []
+        for warp in sorted(self.warps, key=lambda w: w.get_distance(self.room_number, tile_x, tile_y)):
+            targets.append(warp.get_target_room(self.room_number))
+        fall_target: int = self.room_properties.get("WarpFallDestination", 65535)
+        if fall_target != 65535:
+            targets.append(fall_target)
+
+        with self.room_cache_lock:
+            targets = [room for room in dict.fromkeys(targets)
+                       if room != self.room_number and room not in self.room_cache]
+        self.prefetcher.prefetch(targets)
+
+    def draw(self, surface: pygame.Surface, camera_x: float, camera_y: float) -> None:
+        """Draw the map tiles below the sprites (non-priority tiles)
+
+        Args:
+            surface: Surface to draw on
+            camera_x: Camera X position
+            camera_y: Camera Y position
+        """
+        # Snap the camera the same way blit truncates on-screen positions
+        view_x: int = math.ceil(camera_x)
+        view_y: int = math.ceil(camera_y)
+        view_w, view_h = surface.get_size()
+
+        if self.map_surface is None or self.map_surface.get_size() != (view_w, view_h):
+            self.map_surface = pygame.Surface((view_w, view_h), 0, surface)
+            self.map_view = None
+
+        if self.map_view is None:
+            self.draw_chunks(view_x, view_y, self.map_surface.get_rect())
+        else:
+            # Reuse last frame's map image: scroll it by the camera delta and
+            # only redraw the newly exposed edge strips
+            dx: int = view_x - self.map_view[0]
+            dy: int = view_y - self.map_view[1]
+            if abs(dx) >= view_w or abs(dy) >= view_h:
+                self.draw_chunks(view_x, view_y, self.map_surface.get_rect())
+            elif dx or dy:
+                self.map_surface.scroll(-dx, -dy)
+                if dx > 0:
+                    self.draw_chunks(view_x, view_y, pygame.Rect(view_w - dx, 0, dx, view_h))
+                elif dx < 0:
+                    self.draw_chunks(view_x, view_y, pygame.Rect(0, 0, -dx, view_h))
+                if dy > 0:
+                    self.draw_chunks(view_x, view_y, pygame.Rect(0, view_h - dy, view_w, dy))
+                elif dy < 0:
+                    self.draw_chunks(view_x, view_y, pygame.Rect(0, 0, view_w, -dy))
+        self.map_view = (view_x, view_y)
+
+        surface.blit(self.map_surface, (0, 0))
+
+    def draw_priority(self, surface: pygame.Surface, camera_x: float, camera_y: float) -> None:
+        """Draw the priority tiles, on top of the sprites
+
+        Only the visible chunks that contain priority tiles are drawn.
+
+        Args:
+            surface: Surface to draw on
+            camera_x: Camera X position
+            camera_y: Camera Y position
+        """
+        if not self.priority_chunks:
+            return
+
+        view_x: int = math.ceil(camera_x)
+        view_y: int = math.ceil(camera_y)
+        view_w, view_h = surface.get_size()
+
+        draw_list: List[Tuple[pygame.Surface, Tuple[int, int]]] = []
+        for chunk_y in range(view_y // CHUNK_SIZE, (view_y + view_h - 1) // CHUNK_SIZE + 1):
+            for chunk_x in range(view_x // CHUNK_SIZE, (view_x + view_w - 1) // CHUNK_SIZE + 1):
+                if (chunk_x, chunk_y) not in self.priority_chunks:
+                    continue
+                chunk: pygame.Surface = self.chunk_cache.get_or_create(
+                    ("priority", chunk_x, chunk_y),
+                    lambda: self.bake_chunk(chunk_x, chunk_y, priority=True),
+                    CHUNK_BYTES
+                )
+                draw_list.append((chunk, (chunk_x * CHUNK_SIZE - view_x, chunk_y * CHUNK_SIZE - view_y)))
+        surface.fblits(draw_list)
+
+    def draw_chunks(self, view_x: int, view_y: int, area: pygame.Rect) -> None:
+        """Redraw an area of the map image from the pre-rendered chunks
+
+        Args:
+            view_x: Screen X of the map image's top-left corner
+            view_y: Screen Y of the map image's top-left corner
+            area: Area of the map image to redraw
+        """
+        self.map_surface.set_clip(area)
+        self.map_surface.fill((0, 0, 0), area)
+
+        left: int = view_x + area.left
+        top: int = view_y + area.top
+        draw_list: List[Tuple[pygame.Surface, Tuple[int, int]]] = []
+        for chunk_y in range(top // CHUNK_SIZE, (top + area.height - 1) // CHUNK_SIZE + 1):
+            for chunk_x in range(left // CHUNK_SIZE, (left + area.width - 1) // CHUNK_SIZE + 1):
+                chunk: pygame.Surface = self.chunk_cache.get_or_create(
+                    ("base", chunk_x, chunk_y),
+                    lambda: self.bake_chunk(chunk_x, chunk_y, priority=False),
+                    CHUNK_BYTES
+                )
+                draw_list.append((chunk, (chunk_x * CHUNK_SIZE - view_x, chunk_y * CHUNK_SIZE - view_y)))
+        self.map_surface.fblits(draw_list)
+
+        self.map_surface.set_clip(None)
+
+    def bake_chunk(self, chunk_x: int, chunk_y: int, priority: bool) -> pygame.Surface:
+        """Pre-render the background then foreground tiles of a chunk
+
+        Args:
+            chunk_x: Chunk column
+            chunk_y: Chunk row
+            priority: Render the priority tiles instead of the non-priority ones
+
+        Returns:
+            Transparent surface of CHUNK_SIZE x CHUNK_SIZE pixels
+        """
+        chunk: pygame.Surface = pygame.Surface((CHUNK_SIZE, CHUNK_SIZE), pygame.SRCALPHA)
+        origin_x: int = chunk_x * CHUNK_SIZE
+        origin_y: int = chunk_y * CHUNK_SIZE
+        self.background_layer.draw(chunk, origin_x, origin_y, priority)
+        self.foreground_layer.draw(chunk, origin_x, origin_y, priority)
+        return optimize_surface(chunk)
@@ -1,5 +1,9 @@
 from typing import Dict, Tuple, Any
 
+# Warps use Tiled coordinates, heightmap coordinates are offset by 12 tiles
+WARP_TILE_OFFSET: int = 12
+
+
 class Warp:
     """Represents a warp zone that transitions between rooms"""
     
@@ -34,29 +38,37 @@ class Warp:
             current_room: Current room number
             heightmap: Heightmap object for offset calculations
         """
-        # Get the correct warp tile coordinates based on current room
-        if self.room1 == current_room:
-            warp_tile_x = self.x
-            warp_tile_y = self.y
-        else:
-            warp_tile_x = self.x2
-            warp_tile_y = self.y2
+        warp_tile_x, warp_tile_y, width, height = self.get_tile_rect(current_room)
         
         # Convert hero world position to tile coordinates
         hero_tile_x = (hero_x + hero_width // 2) // tile_h
         hero_tile_y = (hero_y + hero_width // 2) // tile_h
         
-        # Apply the 12-tile offset to align warp coordinates with heightmap coordinates
-        # Warp uses Tiled coordinates, heightmap has a 12-tile offset
-        adjusted_warp_tile_x = warp_tile_x - 12
-        adjusted_warp_tile_y = warp_tile_y - 12
-        
         # Point-in-rectangle collision: check if hero tile is within warp bounds
-        collision = (adjusted_warp_tile_x <= hero_tile_x < adjusted_warp_tile_x + self.width and
-                    adjusted_warp_tile_y <= hero_tile_y < adjusted_warp_tile_y + self.height)
+        collision = (warp_tile_x <= hero_tile_x < warp_tile_x + width and
+                    warp_tile_y <= hero_tile_y < warp_tile_y + height)
         
         return collision
     
+    def get_tile_rect(self, current_room: int) -> Tuple[int, int, int, int]:
+        """Get the warp zone in the current room, in heightmap tile coordinates
+        
+        Args:
+            current_room: Current room number
+            
+        Returns:
+            Tuple of (x, y, width, height) in tiles
+        """
+        # Get the correct warp tile coordinates based on current room
+        if self.room1 == current_room:
+            warp_tile_x = self.x
+            warp_tile_y = self.y
+        else:
+            warp_tile_x = self.x2
+            warp_tile_y = self.y2
+        return (warp_tile_x - WARP_TILE_OFFSET, warp_tile_y - WARP_TILE_OFFSET,
+                self.width, self.height)
+    
     def get_destination(
         self, 
         current_room: int, 
@@ -64,8 +76,12 @@ class Warp:
     ) -> Tuple[int, int]:
         """Get the destination coordinates in world pixels
         
+        Destinations on a blocked or out of bounds cell are moved to the closest
+        walkable cell of the destination room.
+        
         Args:
             current_room: Current room number
+            heightmap: Heightmap of the destination room
             
         Returns:
             Tuple of (x, y) in tile coordinates
@@ -79,11 +95,33 @@ class Warp:
             dest_tile_x = self.x2
             dest_tile_y = self.y2
         
-        adjusted_tile_x = dest_tile_x - 12
-        adjusted_tile_y = dest_tile_y - 12
+        adjusted_tile_x = dest_tile_x - WARP_TILE_OFFSET
+        adjusted_tile_y = dest_tile_y - WARP_TILE_OFFSET
+        
+        nearest = heightmap.find_nearest_walkable(adjusted_tile_x, adjusted_tile_y)
+        if nearest is not None and nearest != (adjusted_tile_x, adjusted_tile_y):
+            print(f"Warp destination ({adjusted_tile_x}, {adjusted_tile_y}) is blocked, "
+                  f"moved to nearest walkable tile: {nearest}")
+            return nearest
         
         return adjusted_tile_x, adjusted_tile_y
     
     def get_target_room(self, current_room: int) -> int:
         """Get the target room based on current room"""
-        return self.room2 if current_room == self.room1 else self.room1
\ No newline at end of file
+        return self.room2 if current_room == self.room1 else self.room1
+
+    def get_distance(self, current_room: int, tile_x: float, tile_y: float) -> float:
+        """Get the distance from a tile to this warp zone in the current room
+
+        Args:
+            current_room: Current room number
+            tile_x, tile_y: Tile position (heightmap coordinates)
+
+        Returns:
+            Distance in tiles to the nearest tile of the warp zone (0 inside it)
+        """
+        warp_tile_x, warp_tile_y, _, _ = self.get_tile_rect(current_room)
+
+        dx: float = max(warp_tile_x - tile_x, 0, tile_x - (warp_tile_x + self.width - 1))
+        dy: float = max(warp_tile_y - tile_y, 0, tile_y - (warp_tile_y + self.height - 1))
+        return (dx * dx + dy * dy) ** 0.5